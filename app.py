@@ -1,29 +1,121 @@
 # app.py
+import gc
+import hashlib
+import importlib
 import os
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory
-from werkzeug.utils import secure_filename
-import pandas as pd
+from typing import Dict, Tuple
+from flask import (Flask, Response, g, render_template, request, redirect, url_for, flash, send_from_directory,
+                   make_response, jsonify)
 
-from src.pipeline.prediction_pipeline import PredictionPipeline
+from src.feature_spec import NON_FEATURE_COLS
+from src.pipeline.job_queue import JobQueue
+from src.pipeline.micro_batcher import MicroBatcher
+from src.pipeline.model_registry import ModelRegistry
+from src.pipeline.prediction_cache import PredictionCache, prune_directory
 from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+from src.utils.metrics import PROMETHEUS_CONTENT_TYPE, Counter, Histogram, render as render_metrics
 
 # Config
 UPLOAD_FOLDER = "uploads"
 PREDICTIONS_FOLDER = "artifacts/predictions"
 ALLOWED_EXTENSIONS = {"csv"}
+PREDICT_CHUNK_ROWS = 50_000  # rows read and scored at a time; bounds memory per request
+API_MAX_BATCH_ROWS = 4096  # /api/predict: rows merged into one model call
+API_MAX_WAIT_MS = 5.0  # /api/predict: how long a request may wait for others to join its batch
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+# Disk bounds: least recently used files go first past the size, anything past the age
+PREDICTIONS_MAX_BYTES = 1 << 30
+PREDICTIONS_MAX_AGE = 7 * 86400
+UPLOADS_MAX_BYTES = 1 << 30
+UPLOADS_MAX_AGE = 86400
+JOB_WORKERS = 2  # processes scoring background jobs (per web worker)
+JOB_MAX_PENDING = 16  # queued + running jobs before /jobs answers 503
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PREDICTIONS_FOLDER, exist_ok=True)
 
+logger = get_logger(__name__)
+
 app = Flask(__name__)
 app.secret_key = "replace-with-a-secure-random-key"  # set a secure key for production
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
+# One model per worker process, reloaded when the model store's current version changes
+model_registry = ModelRegistry()
+batcher = MicroBatcher(model_registry.get, max_batch_rows=API_MAX_BATCH_ROWS, max_wait_ms=API_MAX_WAIT_MS)
+# /predict results keyed by (upload hash, model version, max_rows)
+prediction_cache = PredictionCache(PREDICTIONS_FOLDER, max_bytes=PREDICTIONS_MAX_BYTES, max_age=PREDICTIONS_MAX_AGE)
+# Large uploads are scored in the background; results land in the same cache directory
+job_queue = JobQueue(cache_dir=PREDICTIONS_FOLDER, n_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                     chunksize=PREDICT_CHUNK_ROWS)
+
+# Uploads that requests of this process are still scoring (path -> count); pruning keeps them
+_uploads_in_use: Dict[str, int] = {}
+_uploads_lock = threading.Lock()
+
+# Exposed at /metrics (with the model registry's load metrics)
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency by endpoint, method and status.")
+ROWS_SCORED = Counter("prediction_rows_total", "Rows scored, by endpoint.")
+PREDICTION_ERRORS = Counter("prediction_errors_total", "Failed prediction requests, by endpoint and kind.")
+
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def preload():
+    """
+    Import pandas/pyarrow/sklearn/xgboost and load + warm the model in this process.
+
+    Under gunicorn (gunicorn.conf.py) this runs once in the master before
+    workers are forked, so every worker starts ready and shares the model's
+    arrays copy-on-write instead of holding its own copy.
+    """
+    start = time.perf_counter()
+    # Imported lazily everywhere else; import them here so the workers inherit them
+    for module in ("pandas", "pyarrow", "sklearn", "xgboost"):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            # A slim serving install may leave out the training libraries
+            logger.warning(f"{module} not installed; not preloaded")
+    try:
+        # Loading warms the compiled export and the sklearn pipeline (used for large batches)
+        model_registry.get()
+    except CustomException as ce:
+        logger.warning(f"No model preloaded: {ce}")
+    # Move everything allocated so far out of the GC's reach: collections in the
+    # workers then never write to (and so never copy) these pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded model {model_registry.version} in {time.perf_counter() - start:.2f}s")
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 once this worker has a warmed model, 503 before."""
+    version = model_registry.version
+    body = {"ready": version is not None, "model_version": version, "pid": os.getpid()}
+    return jsonify(body), (200 if version is not None else 503)
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None and request.endpoint != "metrics":
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or "unknown",
+                                method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.route("/", methods=["GET"])
 def index():
     return render_template("index.html")
@@ -39,61 +131,170 @@ def predict():
         flash("No selected file")
         return redirect(url_for("index"))
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        saved_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(saved_path)
+        # Uploads are stored by content hash: same-named or same-second uploads never collide
+        saved_path, content_hash = _save_upload(file)
 
-        # Read CSV
-        try:
-            df = pd.read_csv(saved_path, parse_dates=["date"], infer_datetime_format=True)
-        except Exception:
-            # try without parse_dates if date column isn't present
-            df = pd.read_csv(saved_path)
-
-        # Drop target/date columns if present
-        target_col = "vol_7d_target_next"
-        if target_col in df.columns:
-            X_new = df.drop(columns=[target_col, "date"], errors="ignore")
-        else:
-            X_new = df.drop(columns=["date"], errors="ignore")
-
-        # Limit number of rows to predict (optional)
-        try:
-            max_rows = int(request.form.get("max_rows", 100))
-        except Exception:
-            max_rows = 100
-        X_sample = X_new.head(max_rows)
+        # Score every row (streamed in chunks) or only the first max_rows
+        max_rows = _max_rows_from_form()
 
-        # Run prediction with PredictionPipeline
+        # Run prediction with the cached PredictionPipeline, chunk by chunk, unless this
+        # exact file was already scored by this model version
         try:
-            predictor = PredictionPipeline()
-            preds = predictor.predict(X_sample)
+            predictor = model_registry.get()
+            key = prediction_cache.make_key(content_hash, predictor.model_version, max_rows)
+            cached = prediction_cache.get(key)
+            if cached is not None:
+                n_rows, sample_df = cached
+            else:
+                tmp_path = prediction_cache.tmp_path(key)
+                n_rows, sample_df = predictor.predict_csv(saved_path, tmp_path, chunksize=PREDICT_CHUNK_ROWS,
+                                                          max_rows=max_rows)
+                prediction_cache.put(key, tmp_path, n_rows, sample_df, predictor.model_version)
+                ROWS_SCORED.inc(n_rows, endpoint="predict")
+            out_filename = prediction_cache.output_path(key).name
         except CustomException as ce:
+            PREDICTION_ERRORS.inc(endpoint="predict", kind="invalid_input")
             flash(str(ce))
             return redirect(url_for("index"))
         except Exception as e:
+            PREDICTION_ERRORS.inc(endpoint="predict", kind="failed")
             flash(f"Prediction failed: {e}")
             return redirect(url_for("index"))
-
-        # Append predictions and save CSV
-        out_df = X_sample.copy()
-        out_df["prediction"] = preds
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        out_filename = f"predictions_{timestamp}.csv"
-        out_path = Path(PREDICTIONS_FOLDER) / out_filename
-        out_df.to_csv(out_path, index=False)
+        finally:
+            _release_upload(saved_path)
 
         # Render results page with sample predictions and download link
-        sample_results = out_df.head(20).to_dict(orient="records")
-        return render_template("result.html", results=sample_results, download_file=out_filename)
+        sample_results = sample_df.to_dict(orient="records")
+        response = make_response(render_template("result.html", results=sample_results,
+                                                 download_file=out_filename, n_rows=n_rows,
+                                                 model_version=predictor.model_version))
+        response.headers["X-Model-Version"] = predictor.model_version
+        return response
 
     else:
         flash("Allowed file types: csv")
         return redirect(url_for("index"))
 
+def _max_rows_from_form():
+    """None when every row should be scored, else the requested row limit (default 100)."""
+    if request.form.get("all_rows"):
+        return None
+    try:
+        return int(request.form.get("max_rows", 100))
+    except Exception:
+        return 100
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue an uploaded CSV for background scoring; returns 202 with the job id right away."""
+    file = request.files.get("file")
+    if file is None or file.filename == "" or not allowed_file(file.filename):
+        return jsonify({"error": "Upload a .csv file in the 'file' field"}), 400
+    saved_path, content_hash = _save_upload(file)
+    try:
+        # From here on the job queue keeps the upload until the job has read it
+        job_id = job_queue.submit(saved_path, content_hash, max_rows=_max_rows_from_form())
+    except CustomException as ce:
+        PREDICTION_ERRORS.inc(endpoint="submit_job", kind="queue_full")
+        return jsonify({"error": str(ce)}), 503
+    finally:
+        _release_upload(saved_path)
+    response = jsonify({"job_id": job_id, "status_url": url_for("job_status", job_id=job_id)})
+    response.headers["Location"] = url_for("job_status", job_id=job_id)
+    return response, 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Job status and progress (rows scored so far); includes the download URL once done."""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status.get("status") == "done":
+        status["download_url"] = url_for("download_file", filename=status["download_file"])
+    return jsonify(status)
+
+def _save_upload(file) -> Tuple[str, str]:
+    """
+    Stream an upload to uploads/<sha256>.csv, hashing while writing; returns (path, hash).
+
+    The upload is held (never pruned) until the caller calls ``_release_upload``.
+    """
+    digest = hashlib.sha256()
+    tmp_path = Path(app.config["UPLOAD_FOLDER"]) / f".upload.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as out:
+        for block in iter(lambda: file.stream.read(1 << 20), b""):
+            digest.update(block)
+            out.write(block)
+    content_hash = digest.hexdigest()
+    saved_path = Path(app.config["UPLOAD_FOLDER"]) / f"{content_hash[:24]}.csv"
+    os.replace(tmp_path, saved_path)
+    with _uploads_lock:
+        _uploads_in_use[str(saved_path)] = _uploads_in_use.get(str(saved_path), 0) + 1
+        in_use = set(_uploads_in_use)
+    # Never the inputs still to be scored: this upload, other requests' and queued jobs'
+    prune_directory(app.config["UPLOAD_FOLDER"], max_bytes=UPLOADS_MAX_BYTES, max_age=UPLOADS_MAX_AGE,
+                    pattern="*.csv", keep=in_use | job_queue.pending_uploads)
+    return str(saved_path), content_hash
+
+def _release_upload(path: str):
+    with _uploads_lock:
+        left = _uploads_in_use.pop(path, 1) - 1
+        if left > 0:
+            _uploads_in_use[path] = left
+
+def _read_api_payload():
+    """Parse an /api/predict body into a DataFrame: Arrow IPC stream, or JSON records (a list or {"records": [...]})."""
+    import pandas as pd
+    import pyarrow as pa
+
+    if request.mimetype == ARROW_STREAM:
+        return pa.ipc.open_stream(request.get_data()).read_all().to_pandas()
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get("records")
+    if not isinstance(payload, list):
+        raise CustomException('Expected a JSON list of records or {"records": [...]}')
+    return pd.DataFrame.from_records(payload)
+
+@app.route("/api/predict", methods=["POST"])
+def api_predict():
+    """Machine-facing prediction; concurrent small requests share one model call."""
+    try:
+        df = _read_api_payload()
+    except Exception as e:
+        # Malformed body (bad JSON/Arrow or wrong shape): the client's error
+        PREDICTION_ERRORS.inc(endpoint="api_predict", kind="invalid_input")
+        return jsonify({"error": str(e) if isinstance(e, CustomException) else f"Invalid payload: {e}"}), 400
+    try:
+        X_new = df.drop(columns=NON_FEATURE_COLS, errors="ignore")
+        preds, model_version = batcher.submit(X_new)
+    except CustomException as ce:
+        PREDICTION_ERRORS.inc(endpoint="api_predict", kind="invalid_input")
+        return jsonify({"error": str(ce)}), 400
+    except Exception as e:
+        # Server-side failure: 500 so callers' retry logic treats it as such
+        PREDICTION_ERRORS.inc(endpoint="api_predict", kind="failed")
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+    ROWS_SCORED.inc(len(preds), endpoint="api_predict")
+
+    if request.mimetype == ARROW_STREAM:
+        import pyarrow as pa
+        table = pa.table({"prediction": preds})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        response = make_response(sink.getvalue().to_pybytes())
+        response.mimetype = ARROW_STREAM
+    else:
+        response = jsonify({"predictions": preds.tolist(), "model_version": model_version})
+    response.headers["X-Model-Version"] = model_version
+    return response
+
 @app.route("/download/<path:filename>")
 def download_file(filename):
     return send_from_directory(PREDICTIONS_FOLDER, filename, as_attachment=True)
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5001)
+    # Development server; for production use: gunicorn -c gunicorn.conf.py app:app
+    preload()
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", host="0.0.0.0", port=5001)
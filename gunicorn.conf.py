@@ -0,0 +1,28 @@
+"""
+Production serving: gunicorn -c gunicorn.conf.py app:app
+
+The app (pandas, sklearn, xgboost and the warmed model) is loaded once in the
+master and workers are forked from it, so the model's arrays are shared
+copy-on-write rather than loaded per worker. Settings can be overridden with
+the environment variables below.
+"""
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1))
+# Threads let concurrent /api/predict requests in one worker share a micro-batch
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 4))
+timeout = int(os.environ.get("WEB_TIMEOUT", 120))
+preload_app = True
+
+
+def on_starting(server):
+    # preload_app has already imported app.py in the master; load the model before forking
+    import app
+
+    app.preload()
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} forked with the preloaded model")
@@ -0,0 +1,204 @@
+"""
+Benchmarks
+----------
+Times the main stages on seeded synthetic data (see synthetic.py) in a
+throw-away working directory and writes the results as JSON:
+
+    python -m src.benchmarks.run --out artifacts/benchmarks/baseline.json
+
+``--compare`` checks a run against an earlier one and exits with status 1
+when any benchmark's median got slower by more than ``--threshold``:
+
+    python -m src.benchmarks.run --compare artifacts/benchmarks/baseline.json
+
+Benchmarks: import time of each entry point (see startup.py),
+feature_engineer (1 and all cores), save_processed, run_training,
+PredictionPipeline.predict per batch size, and the Flask /predict route
+through its test client.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.benchmarks.startup import run_startup
+from src.benchmarks.synthetic import make_ohlcv
+from src.feature_spec import NON_FEATURE_COLS
+from src.utils.sharding import available_cores
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def measure(fn: Callable, repeat: int = 3, rows: Optional[int] = None) -> dict:
+    """Run ``fn`` ``repeat`` times; wall-clock seconds per run plus rows/s of the median run."""
+    times = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    result = {"median_s": median, "min_s": min(times), "runs": times}
+    if rows:
+        result["rows"] = rows
+        result["rows_per_s"] = rows / median if median > 0 else None
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(n_assets: int = 200, n_days: int = 730, gap_frac: float = 0.02, zero_mcap_frac: float = 0.01,
+                   batch_sizes: Sequence[int] = (1, 100, 10_000), repeat: int = 3, seed: int = 42) -> dict:
+    """Run every benchmark and return {"meta": ..., "benchmarks": {name: timings}}."""
+    from src.features import feature_engineer, save_processed, ensure_datetime
+    from src.components.feature_store import FeatureStore
+    from src.pipeline.prediction_pipeline import PredictionPipeline
+    from src.pipeline.streaming_pipeline import BAR_COLUMNS, StreamingPipeline
+    from src.pipeline.tick_sources import MemorySource
+    from src.pipeline.training_pipeline import run_training
+
+    n_cores = available_cores()
+    params = {"n_assets": n_assets, "n_days": n_days, "gap_frac": gap_frac, "zero_mcap_frac": zero_mcap_frac,
+              "seed": seed, "repeat": repeat}
+    meta = {"params": params, "python": sys.version.split()[0], "platform": platform.platform(),
+            "cores": n_cores, "commit": _git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    results: Dict[str, dict] = {}
+
+    # Fresh interpreters, before this process imports anything heavy
+    results.update(run_startup(repeat=repeat))
+
+    raw = ensure_datetime(make_ohlcv(n_assets, n_days, gap_frac=gap_frac, zero_mcap_frac=zero_mcap_frac, seed=seed))
+    print(f"🔹 Synthetic data: {len(raw)} rows ({n_assets} assets x {n_days} days)")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        artifacts_dir = Path(workdir) / "artifacts"
+
+        results["feature_engineer"] = measure(lambda: feature_engineer(raw), repeat, rows=len(raw))
+        if n_cores > 1:
+            results[f"feature_engineer[workers={n_cores}]"] = measure(
+                lambda: feature_engineer(raw, n_workers=n_cores), repeat, rows=len(raw))
+        featured = feature_engineer(raw)
+
+        results["save_processed"] = measure(lambda: save_processed(featured, artifacts_dir=artifacts_dir),
+                                            repeat, rows=len(featured))
+
+        # Training is the slowest stage; one run is representative enough
+        results["run_training"] = measure(lambda: run_training(artifacts_dir=artifacts_dir), 1,
+                                          rows=int(FeatureStore(artifacts_dir).read(model_ready=True).shape[0]))
+
+        X = FeatureStore(artifacts_dir).read(model_ready=True)
+        X = X.drop(columns=NON_FEATURE_COLS, errors="ignore")
+        predictor = PredictionPipeline(artifacts_dir=artifacts_dir)
+        predictor.warmup()
+        for size in batch_sizes:
+            batch = X.head(size)
+            results[f"predict[{len(batch)}]"] = measure(lambda: predictor.predict(batch), repeat, rows=len(batch))
+
+        # One closed daily bar per asset: online feature update + model, as in the streaming pipeline
+        streaming = StreamingPipeline(MemorySource([]), lambda forecasts: None, artifacts_dir=str(artifacts_dir))
+        streaming.warm_start(raw.sort_values(["crypto_name", "date"]))
+        last = raw.groupby("crypto_name", sort=False).tail(1)
+        bars = {"rows": streaming.index.lookup(last["crypto_name"]), "crypto_name": last["crypto_name"].to_numpy(),
+                "start": 0.0, "end": 86400.0, "closed_at": time.perf_counter(),
+                **{c: last[c].to_numpy(dtype=float) for c in BAR_COLUMNS}}
+        streaming.score(bars)
+        results[f"stream_bar_to_forecast[{len(last)}]"] = measure(lambda: streaming.score(bars), repeat,
+                                                                  rows=len(last))
+
+        # The app resolves artifacts/ and uploads/ against the working directory
+        os.chdir(workdir)
+        if str(PROJECT_ROOT) not in sys.path:
+            sys.path.insert(0, str(PROJECT_ROOT))
+        try:
+            import app as flask_app
+            client = flask_app.app.test_client()
+            upload = X.head(max(batch_sizes)).to_csv(index=False).encode()
+
+            def post():
+                response = client.post("/predict", content_type="multipart/form-data",
+                                       data={"file": (io.BytesIO(upload), "bench.csv"), "all_rows": "1"})
+                if response.status_code != 200:
+                    raise RuntimeError(f"/predict returned {response.status_code}")
+
+            def post_uncached():
+                for path in Path(flask_app.PREDICTIONS_FOLDER).glob("predictions_*"):
+                    path.unlink()
+                post()
+
+            n_upload = min(len(X), max(batch_sizes))
+            post()  # first request loads the model into the registry
+            results[f"flask_predict[{n_upload}]"] = measure(post_uncached, repeat, rows=n_upload)
+            # Same upload and model again: answered from the prediction cache
+            results[f"flask_predict_cached[{n_upload}]"] = measure(post, repeat, rows=n_upload)
+        finally:
+            os.chdir(cwd)
+
+    return {"meta": meta, "benchmarks": results}
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> List[str]:
+    """Print median ratios and return the benchmarks slower than ``1 + threshold`` x baseline."""
+    regressions = []
+    print(f"{'benchmark':<36}{'baseline':>12}{'current':>12}{'ratio':>9}")
+    for name, cur in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            print(f"{name:<36}{'-':>12}{cur['median_s']:>11.4f}s{'new':>9}")
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] > 0 else float("inf")
+        flag = "  ❌" if ratio > 1 + threshold else ""
+        print(f"{name:<36}{base['median_s']:>11.4f}s{cur['median_s']:>11.4f}s{ratio:>8.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    if current["meta"]["params"] != baseline["meta"]["params"]:
+        print("⚠️ Runs used different parameters; ratios are not comparable")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipelines on synthetic data.")
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--gap-frac", type=float, default=0.02, help="Fraction of bars dropped (missing days)")
+    parser.add_argument("--zero-mcap-frac", type=float, default=0.01, help="Fraction of bars with marketCap 0")
+    parser.add_argument("--batch-sizes", default="1,100,10000", help="Comma-separated predict batch sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, default=Path("artifacts/benchmarks/latest.json"))
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline JSON to check against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(n_assets=args.assets, n_days=args.days, gap_frac=args.gap_frac,
+                            zero_mcap_frac=args.zero_mcap_frac,
+                            batch_sizes=[int(b) for b in args.batch_sizes.split(",")],
+                            repeat=args.repeat, seed=args.seed)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"✅ Results saved to: {args.out}")
+
+    if args.compare is not None:
+        regressions = compare(report, json.loads(args.compare.read_text()), threshold=args.threshold)
+        if regressions:
+            print(f"❌ Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
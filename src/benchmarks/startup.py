@@ -0,0 +1,101 @@
+"""
+Startup Benchmark
+-----------------
+Import time of every entry point, measured in a fresh interpreter with
+``python -X importtime`` so nothing is cached in ``sys.modules``:
+
+    python -m src.benchmarks.startup
+    python -m src.benchmarks.startup --module app --top 15
+
+For each entry point it reports the median cumulative import time and the
+heaviest imports behind it. ``run.py`` includes the same timings
+(``import[<name>]``), so slower startup fails the regression gate too.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# name -> module imported by that entry point
+ENTRY_POINTS: Dict[str, str] = {
+    "app": "app",
+    "features": "src.features",
+    "training_pipeline": "src.pipeline.training_pipeline",
+    "backtest_pipeline": "src.pipeline.backtest_pipeline",
+    "prediction_pipeline": "src.pipeline.prediction_pipeline",
+    "benchmarks": "src.benchmarks.run",
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, float, str]]:
+    """(depth, cumulative seconds, module) for every line of ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        # One separator space, then two per nesting level
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((depth, int(cumulative) / 1e6, name.strip()))
+    return rows
+
+
+def import_time(module: str, repeat: int = 3) -> dict:
+    """Median cumulative import time of ``module`` and its heaviest direct imports (median run)."""
+    runs = []
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")]))}
+    for _ in range(max(1, repeat)):
+        # Entry points create artifacts/, uploads/, logs/ on import; keep those out of the checkout
+        with tempfile.TemporaryDirectory(prefix="startup_") as workdir:
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                  cwd=workdir, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        rows = parse_importtime(proc.stderr)
+        # The module and its parent packages, not the interpreter's own startup imports
+        total = sum(seconds for depth, seconds, name in rows
+                    if depth == 0 and (name == module or module.startswith(name + ".")))
+        # Direct imports of the module: depth-1 rows just before its own (last) row
+        direct = []
+        for depth, seconds, name in reversed(rows[:-1]):
+            if depth == 0:
+                break
+            if depth == 1:
+                direct.append([name, seconds])
+        runs.append((total, direct))
+
+    times = [total for total, _ in runs]
+    median = statistics.median(times)
+    _, direct = min(runs, key=lambda run: abs(run[0] - median))
+    return {"median_s": median, "min_s": min(times), "runs": times,
+            "heaviest": sorted(direct, key=lambda x: -x[1])}
+
+
+def run_startup(modules: Dict[str, str] = ENTRY_POINTS, repeat: int = 3) -> Dict[str, dict]:
+    return {f"import[{name}]": import_time(module, repeat) for name, module in modules.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of each entry point.")
+    parser.add_argument("--module", default=None, help="Only this module (e.g. app or src.features)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="Heaviest imports to list per entry point")
+    args = parser.parse_args()
+
+    modules = {args.module: args.module} if args.module else ENTRY_POINTS
+    for name, result in run_startup(modules, repeat=args.repeat).items():
+        print(f"{name:<36}{result['median_s'] * 1000:>9.1f} ms")
+        for module, seconds in result["heaviest"][:args.top]:
+            print(f"    {module:<40}{seconds * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Synthetic OHLCV Data
+--------------------
+Seeded generator of a crypto price table with the raw schema of
+data/crypto_prices.csv (see src/components/data_ingestion.py), for
+benchmarks and parity checks. The same arguments always give the same frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.components.data_ingestion import RAW_DTYPES
+
+
+def make_ohlcv(n_assets: int = 100, n_days: int = 365, gap_frac: float = 0.0, zero_mcap_frac: float = 0.0,
+               seed: int = 42, start: str = "2018-01-01") -> pd.DataFrame:
+    """
+    ``n_assets`` x ``n_days`` daily bars as geometric random walks.
+
+    ``gap_frac`` of the bars are dropped (missing days) and ``zero_mcap_frac``
+    get a marketCap of 0, like delisted or unreported coins. Rows come sorted
+    by crypto_name, date.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_days, freq="D")
+    shape = (n_assets, n_days)
+
+    # Per-asset price level and daily volatility, then a log-normal walk
+    level = np.exp(rng.uniform(-2, 10, (n_assets, 1)))
+    sigma = rng.uniform(0.01, 0.08, (n_assets, 1))
+    close = level * np.exp(np.cumsum(rng.normal(0, 1, shape) * sigma, axis=1))
+    open_ = np.concatenate((level, close[:, :-1]), axis=1)
+    spread = np.abs(rng.normal(0, 1, shape)) * sigma
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    supply = rng.uniform(1e6, 1e10, (n_assets, 1))
+    market_cap = close * supply
+    volume = market_cap * rng.uniform(0.001, 0.3, shape)
+    market_cap[rng.random(shape) < zero_mcap_frac] = 0.0
+
+    df = pd.DataFrame({
+        "open": open_.ravel(),
+        "high": high.ravel(),
+        "low": low.ravel(),
+        "close": close.ravel(),
+        "volume": volume.ravel(),
+        "marketCap": market_cap.ravel(),
+        "crypto_name": np.repeat([f"coin_{i:05d}" for i in range(n_assets)], n_days),
+        "date": np.tile(dates, n_assets),
+    })
+    df["timestamp"] = df["date"].dt.tz_localize("UTC") + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    if gap_frac > 0:
+        df = df[rng.random(len(df)) >= gap_frac]
+    df = df[["open", "high", "low", "close", "volume", "marketCap", "timestamp", "crypto_name", "date"]]
+    return df.astype(RAW_DTYPES).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    sample = make_ohlcv(n_assets=3, n_days=5, gap_frac=0.1, zero_mcap_frac=0.1)
+    print(sample)
+    print(sample.dtypes)
@@ -0,0 +1,273 @@
+"""
+Candidate Models
+----------------
+Registry of candidate estimators for training, and a scheduler that trains
+them concurrently in separate processes on the shared transformed matrices.
+
+Each candidate gets a share of the machine's cores (its ``n_jobs``) so
+concurrent candidates don't oversubscribe each other. Candidates declared with
+``"input": "frame"`` (the volatility baselines) take the untransformed
+feature frame instead and are fitted in the calling process.
+"""
+
+import importlib
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Tuple, Union
+
+import joblib
+from threadpoolctl import threadpool_limits
+
+from src.components.model_trainer import ModelTrainer
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+from src.utils.metrics import span
+from src.utils.sharding import available_cores
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+
+# name -> estimator class ("module:Class"), default params, and how it uses cores.
+# "threads" is the param receiving the core budget (None = single-threaded);
+# "weight" is its relative share when cores are split.
+# "search" is the hyperparameter search space (see hyperparameter_search.py);
+# "early_stopping" names the constructor param enabling it during the search.
+# "input" is "matrix" (preprocessed matrices, the default) or "frame" (raw feature frame).
+CANDIDATES: Dict[str, dict] = {
+    "random_forest": {
+        "estimator": "sklearn.ensemble:RandomForestRegressor",
+        "params": {"n_estimators": 50, "random_state": 42},
+        "threads": "n_jobs",
+        "weight": 1.0,
+        "search": {
+            "n_estimators": {"type": "int", "low": 50, "high": 400},
+            "max_depth": {"type": "choice", "options": [None, 8, 12, 16, 24]},
+            "min_samples_leaf": {"type": "int", "low": 1, "high": 20},
+            "max_features": {"type": "choice", "options": [1.0, 0.5, "sqrt"]},
+        },
+    },
+    "xgboost": {
+        "estimator": "xgboost:XGBRegressor",
+        "params": {
+            "n_estimators": 100,
+            "learning_rate": 0.1,
+            "max_depth": 6,
+            "subsample": 0.8,
+            "colsample_bytree": 0.8,
+            "random_state": 42,
+        },
+        "threads": "n_jobs",
+        "weight": 1.0,
+        "search": {
+            # Rounds are capped by early stopping on the validation rows
+            "n_estimators": {"type": "choice", "options": [1000]},
+            "learning_rate": {"type": "log", "low": 0.01, "high": 0.3},
+            "max_depth": {"type": "int", "low": 3, "high": 10},
+            "subsample": {"type": "float", "low": 0.5, "high": 1.0},
+            "colsample_bytree": {"type": "float", "low": 0.5, "high": 1.0},
+            "min_child_weight": {"type": "log", "low": 1.0, "high": 20.0},
+            "reg_lambda": {"type": "log", "low": 0.1, "high": 10.0},
+        },
+        "early_stopping": "early_stopping_rounds",
+    },
+    "extra_trees": {
+        "estimator": "sklearn.ensemble:ExtraTreesRegressor",
+        "params": {"n_estimators": 50, "random_state": 42},
+        "threads": "n_jobs",
+        "weight": 1.0,
+        "search": {
+            "n_estimators": {"type": "int", "low": 50, "high": 400},
+            "max_depth": {"type": "choice", "options": [None, 8, 12, 16, 24]},
+            "min_samples_leaf": {"type": "int", "low": 1, "high": 20},
+            "max_features": {"type": "choice", "options": [1.0, 0.5, "sqrt"]},
+        },
+    },
+    "ridge": {
+        "estimator": "sklearn.linear_model:Ridge",
+        "params": {"alpha": 1.0},
+        "threads": None,
+        "weight": 0.0,
+        "search": {"alpha": {"type": "log", "low": 1e-3, "high": 100.0}},
+    },
+    # Volatility baselines (see volatility_baselines.py), estimated for all cryptos at once
+    "ewma": {
+        "estimator": "src.components.volatility_baselines:EWMAVolatility",
+        "params": {"lam": 0.94},
+        "threads": None,
+        "weight": 0.0,
+        "input": "frame",
+    },
+    "garch": {
+        "estimator": "src.components.volatility_baselines:GARCHVolatility",
+        "params": {},
+        "threads": None,
+        "weight": 0.0,
+        "input": "frame",
+    },
+    "har": {
+        "estimator": "src.components.volatility_baselines:HARVolatility",
+        "params": {"shrinkage": 50.0},
+        "threads": None,
+        "weight": 0.0,
+        "input": "frame",
+    },
+}
+
+BASELINE_CANDIDATES = ["ewma", "garch", "har"]
+
+DEFAULT_CANDIDATES = ["random_forest", "xgboost"]
+
+CandidateSpec = Union[List[str], Mapping[str, Optional[dict]]]
+
+
+def register_candidate(name: str, estimator: str, params: Optional[dict] = None,
+                       threads: Optional[str] = None, weight: float = 1.0, search: Optional[dict] = None,
+                       early_stopping: Optional[str] = None, input: str = "matrix"):
+    """Add (or replace) a candidate, e.g. register_candidate("lgbm", "lightgbm:LGBMRegressor", threads="n_jobs")."""
+    if input not in ("matrix", "frame"):
+        raise CustomException(f"Unknown candidate input: {input}", errors={"available": ["matrix", "frame"]})
+    CANDIDATES[name] = {"estimator": estimator, "params": dict(params or {}), "threads": threads, "weight": weight,
+                        "search": dict(search or {}), "early_stopping": early_stopping, "input": input}
+
+
+def uses_frame(name: str) -> bool:
+    """Whether a candidate fits on the untransformed feature frame rather than the preprocessed matrices."""
+    return CANDIDATES.get(name, {}).get("input", "matrix") == "frame"
+
+
+def build_estimator(name: str, n_jobs: Optional[int] = None, params: Optional[dict] = None):
+    """Instantiate a registered candidate with its defaults, ``params`` overrides and core budget."""
+    if name not in CANDIDATES:
+        raise CustomException(f"Unknown candidate model: {name}", errors={"available": sorted(CANDIDATES)})
+    spec = CANDIDATES[name]
+    module_name, class_name = spec["estimator"].split(":")
+    estimator_cls = getattr(importlib.import_module(module_name), class_name)
+    kwargs = {**spec["params"], **(params or {})}
+    if spec["threads"] and n_jobs is not None:
+        kwargs[spec["threads"]] = n_jobs
+    return estimator_cls(**kwargs)
+
+
+def normalize_candidates(candidates: Optional[CandidateSpec]) -> Dict[str, dict]:
+    """Accept a list of names or a {name: param overrides} mapping."""
+    if candidates is None:
+        candidates = DEFAULT_CANDIDATES
+    if isinstance(candidates, Mapping):
+        return {name: dict(params or {}) for name, params in candidates.items()}
+    return {name: {} for name in candidates}
+
+
+def split_cores(names: List[str], n_cores: int) -> Dict[str, int]:
+    """
+    Give single-threaded candidates one core each and split the rest among
+    multi-threaded ones by weight (at least one core each).
+    """
+    budget = {name: 1 for name in names}
+    threaded = [n for n in names if CANDIDATES[n]["threads"] and CANDIDATES[n]["weight"] > 0]
+    spare = n_cores - len(names)
+    if threaded and spare > 0:
+        total = sum(CANDIDATES[n]["weight"] for n in threaded)
+        shares = {n: spare * CANDIDATES[n]["weight"] / total for n in threaded}
+        for n in threaded:
+            budget[n] += int(shares[n])
+        # Hand out cores lost to rounding, largest remainder first
+        leftover = n_cores - sum(budget.values())
+        for n in sorted(threaded, key=lambda n: shares[n] - int(shares[n]), reverse=True)[:leftover]:
+            budget[n] += 1
+    return budget
+
+
+def fit_candidate(name: str, params: dict, n_jobs: int, data, artifacts_dir: str):
+    """Fit and evaluate one candidate; ``data`` is the (train, test) inputs or a joblib file to memory-map."""
+    start = time.perf_counter()
+    with threadpool_limits(limits=n_jobs):
+        if isinstance(data, str):
+            data = joblib.load(data, mmap_mode="r")
+        Xt_train, y_train, Xt_test, y_test = data
+        model = build_estimator(name, n_jobs=n_jobs, params=params)
+        with span(f"fit.{name}", n_jobs=n_jobs):
+            model.fit(Xt_train, y_train)
+        with span(f"evaluate.{name}"):
+            metrics = ModelTrainer(artifacts_dir=artifacts_dir).evaluate(y_test, model.predict(Xt_test))
+    return name, model, metrics, time.perf_counter() - start
+
+
+def train_candidates(Xt_train, y_train, Xt_test, y_test, candidates: Optional[CandidateSpec] = None,
+                     n_cores: Optional[int] = None, artifacts_dir: str = "artifacts",
+                     frames: Optional[Tuple["pd.DataFrame", "pd.DataFrame"]] = None) -> Dict[str, dict]:
+    """
+    Train every candidate concurrently and return {name: {"model", "metrics", "seconds"}}.
+
+    ``frames`` is the untransformed (X_train, X_test) that frame candidates
+    need. Metrics are logged as each candidate finishes.
+    """
+    specs = normalize_candidates(candidates)
+    for name in specs:
+        if name not in CANDIDATES:
+            raise CustomException(f"Unknown candidate model: {name}", errors={"available": sorted(CANDIDATES)})
+
+    results: Dict[str, dict] = {}
+    frame_names = [n for n in specs if uses_frame(n)]
+    if frame_names and frames is None:
+        raise CustomException("Frame candidates need the untransformed feature frames",
+                              errors={"candidates": frame_names})
+    for name in frame_names:
+        # Vectorized over all cryptos and quick: fitted here rather than in a worker
+        data = (frames[0], y_train, frames[1], y_test)
+        _, model, metrics, seconds = fit_candidate(name, specs[name], 1, data, str(artifacts_dir))
+        results[name] = {"model": model, "metrics": metrics, "seconds": seconds}
+        logger.info(f"{name} finished in {seconds:.1f}s: {metrics}")
+
+    names = [n for n in specs if not uses_frame(n)]
+    if names:
+        results.update(_train_matrix_candidates(Xt_train, y_train, Xt_test, y_test, names, specs, n_cores,
+                                                str(artifacts_dir)))
+    # Keep the caller's candidate order
+    return {name: results[name] for name in specs}
+
+
+def _train_matrix_candidates(Xt_train, y_train, Xt_test, y_test, names: List[str], specs: Dict[str, dict],
+                             n_cores: Optional[int], artifacts_dir: str) -> Dict[str, dict]:
+    n_cores = n_cores or available_cores()
+    n_workers = max(1, min(len(names), n_cores))
+    budget = split_cores(names, max(n_cores, len(names))) if n_workers > 1 else {n: n_cores for n in names}
+    logger.info(f"Training {len(names)} candidates on {n_cores} cores, {n_workers} at a time: {budget}")
+
+    results: Dict[str, dict] = {}
+    if n_workers == 1:
+        data = (Xt_train, y_train, Xt_test, y_test)
+        for name in names:
+            _, model, metrics, seconds = fit_candidate(name, specs[name], budget[name], data, artifacts_dir)
+            results[name] = {"model": model, "metrics": metrics, "seconds": seconds}
+            logger.info(f"{name} finished in {seconds:.1f}s: {metrics}")
+        return results
+
+    with tempfile.TemporaryDirectory(prefix="candidates_") as tmp:
+        # One copy on disk, memory-mapped by every worker instead of pickled to each
+        data_path = str(Path(tmp) / "matrices.joblib")
+        joblib.dump((Xt_train, y_train, Xt_test, y_test), data_path)
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(fit_candidate, n, specs[n], budget[n], data_path, artifacts_dir)
+                       for n in names]
+            for future in as_completed(futures):
+                name, model, metrics, seconds = future.result()
+                results[name] = {"model": model, "metrics": metrics, "seconds": seconds}
+                logger.info(f"{name} finished in {seconds:.1f}s: {metrics}")
+    return results
+
+
+def select_best(results: Mapping[str, dict], metric: str = "r2") -> str:
+    """Name of the candidate with the highest ``metric`` (first one wins ties)."""
+    return max(results, key=lambda name: results[name]["metrics"][metric])
+
+
+if __name__ == "__main__":
+    print("🔹 Core budgets for 64 cores:")
+    for names in (["random_forest", "xgboost"], ["random_forest", "xgboost", "extra_trees", "ridge"]):
+        print(f"  {names}: {split_cores(names, 64)}")
@@ -1,23 +1,154 @@
+"""
+Data Ingestion
+--------------
+Loads the raw price file with a declared schema: float32 prices/volumes,
+categorical ``crypto_name`` and fixed date formats, instead of pandas'
+float64/object defaults and per-value date inference.
+
+CSV files are read in chunks and filtered (cryptos, date range, columns)
+chunk by chunk, so only the selected rows are ever held in memory.
+``iter_chunks()`` streams typed chunks for files larger than RAM.
+"""
+
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
 import pandas as pd
-from typing import Optional
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pandas.api.types import union_categoricals
+
+# Declared raw schema; columns not listed here keep pandas' inferred dtype
+RAW_DTYPES = {
+    "open": "float32",
+    "high": "float32",
+    "low": "float32",
+    "close": "float32",
+    "volume": "float32",
+    "marketCap": "float32",
+    "crypto_name": "category",
+}
+DATE_FORMAT = "%Y-%m-%d"
+TIMESTAMP_FORMAT = "ISO8601"
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def memory_report(df: pd.DataFrame) -> Dict[str, float]:
+    """Deep memory footprint in MB per column, plus a ``total`` entry."""
+    usage = df.memory_usage(deep=True, index=False) / 2**20
+    report = {col: round(float(mb), 2) for col, mb in usage.items()}
+    report["total"] = round(float(usage.sum()), 2)
+    return report
+
+
+def _parse_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse date/timestamp with their fixed formats; fall back to inference if the file differs."""
+    for col, fmt, utc in (("date", DATE_FORMAT, False), ("timestamp", TIMESTAMP_FORMAT, True)):
+        if col not in df.columns or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        try:
+            df[col] = pd.to_datetime(df[col], format=fmt, utc=utc)
+        except (ValueError, TypeError):
+            print(f"⚠️ '{col}' does not match {fmt}; inferring its format")
+            df[col] = pd.to_datetime(df[col], utc=utc, errors="coerce")
+    return df
+
+
+def _concat(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate chunks without categorical columns degrading to object."""
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = union_categoricals([c[col] for c in chunks], sort_categories=True)
+    return df
+
 
 class DataIngestion:
-    
-    def __init__(self, data_path: str, artifacts_dir: str = "artifacts"):
+
+    def __init__(self, data_path: str, artifacts_dir: str = "artifacts", chunksize: int = DEFAULT_CHUNKSIZE):
         self.data_path = Path(data_path)
         self.artifacts_dir = Path(artifacts_dir)
         self.raw_dir = self.artifacts_dir / "raw"
         self.raw_dir.mkdir(parents=True, exist_ok=True)
+        self.chunksize = chunksize
+
+    def _filter(self, df: pd.DataFrame, cryptos: Optional[Sequence[str]], start, end) -> pd.DataFrame:
+        mask = None
+        if cryptos is not None:
+            mask = df["crypto_name"].isin([str(c) for c in cryptos])
+        if start is not None:
+            after = df["date"] >= pd.Timestamp(start)
+            mask = after if mask is None else mask & after
+        if end is not None:
+            before = df["date"] <= pd.Timestamp(end)
+            mask = before if mask is None else mask & before
+        return df if mask is None else df[mask.to_numpy()]
+
+    def iter_chunks(
+        self,
+        columns: Optional[List[str]] = None,
+        cryptos: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        chunksize: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield typed, filtered chunks of at most ``chunksize`` rows.
+
+        ``start``/``end`` bound ``date`` inclusively. Filter columns are read
+        even if not requested, then dropped from the yielded chunks.
+        """
+        chunksize = chunksize or self.chunksize
+        wanted = None
+        if columns is not None:
+            wanted = list(dict.fromkeys(list(columns) + (["crypto_name"] if cryptos is not None else [])
+                                        + (["date"] if start is not None or end is not None else [])))
 
-    def load_data(self) -> pd.DataFrame:
         if self.data_path.suffix == ".csv":
-            df = pd.read_csv(self.data_path, parse_dates=["date"], infer_datetime_format=True)
+            header = pd.read_csv(self.data_path, nrows=0).columns
+            usecols = wanted if wanted is not None else list(header)
+            dtypes = {c: t for c, t in RAW_DTYPES.items() if c in usecols}
+            reader = pd.read_csv(self.data_path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+            for chunk in reader:
+                chunk = self._filter(_parse_dates(chunk), cryptos, start, end)
+                if len(chunk):
+                    yield chunk[columns] if columns is not None else chunk
         elif self.data_path.suffix == ".parquet":
-            df = pd.read_parquet(self.data_path)
+            # Filters are pushed down to the Parquet reader (row groups are skipped)
+            dataset = ds.dataset(self.data_path, format="parquet")
+            predicate = None
+            if cryptos is not None:
+                predicate = ds.field("crypto_name").isin([str(c) for c in cryptos])
+            if start is not None:
+                f = ds.field("date") >= pa.scalar(pd.Timestamp(start).to_datetime64())
+                predicate = f if predicate is None else predicate & f
+            if end is not None:
+                f = ds.field("date") <= pa.scalar(pd.Timestamp(end).to_datetime64())
+                predicate = f if predicate is None else predicate & f
+            for batch in dataset.to_batches(columns=wanted, filter=predicate, batch_size=chunksize):
+                if batch.num_rows == 0:
+                    continue
+                chunk = batch.to_pandas()
+                chunk = _parse_dates(chunk.astype({c: t for c, t in RAW_DTYPES.items() if c in chunk.columns}))
+                yield chunk[columns] if columns is not None else chunk
         else:
             raise ValueError(f"Unsupported file format: {self.data_path.suffix}")
-        print(f"Loaded data with shape: {df.shape}")
+
+    def load_data(
+        self,
+        columns: Optional[List[str]] = None,
+        cryptos: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Load the (filtered) file into one typed DataFrame and print its memory footprint."""
+        df = _concat(list(self.iter_chunks(columns=columns, cryptos=cryptos, start=start, end=end)))
+        if "crypto_name" in df.columns and isinstance(df["crypto_name"].dtype, pd.CategoricalDtype):
+            df["crypto_name"] = df["crypto_name"].cat.remove_unused_categories()
+        report = memory_report(df)
+        print(f"Loaded data with shape: {df.shape} ({report['total']:.1f} MB in memory)")
         return df
 
 
@@ -29,7 +160,8 @@ class DataIngestion:
 
 if __name__ == "__main__":
     # Correct path (inside data folder)
-    ingestion = DataIngestion(data_path="data/crypto_prices.csv")  
+    ingestion = DataIngestion(data_path="data/crypto_prices.csv")
     df = ingestion.load_data()
     print(df.head())
+    print("Memory per column (MB):", memory_report(df))
     ingestion.save_raw(df)
@@ -0,0 +1,176 @@
+"""
+Feature Store
+-------------
+Parquet dataset holding the engineered feature table, hive-partitioned by
+crypto_name and year. The model-ready view is the stored boolean column
+``model_ready`` (all required columns non-null), so there is one copy on disk.
+"""
+
+import json
+from pathlib import Path
+import shutil
+from typing import List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+
+PARTITION_COLS = ["crypto_name", "year"]
+
+
+class FeatureStore:
+    def __init__(self, artifacts_dir: str = "artifacts"):
+        self.artifacts_dir = Path(artifacts_dir)
+        self.store_dir = self.artifacts_dir / "feature_store"
+        self.manifest_path = self.store_dir / "_manifest.json"
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def _partitioning(self, dictionary: bool = False) -> ds.Partitioning:
+        name_type = pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+        schema = pa.schema([("crypto_name", name_type), ("year", pa.int16())])
+        if dictionary:
+            return ds.partitioning(schema, flavor="hive", dictionaries="infer")
+        return ds.partitioning(schema, flavor="hive")
+
+    def _to_table(self, df: pd.DataFrame, required_cols: Sequence[str]) -> pa.Table:
+        df = df.assign(
+            model_ready=df[list(required_cols)].notna().all(axis=1),
+            year=df["date"].dt.year.astype("int16"),
+        )
+        df["crypto_name"] = df["crypto_name"].astype(str)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    def _write_partitions(self, table: pa.Table):
+        n_partitions = len(table.select(PARTITION_COLS).group_by(PARTITION_COLS).aggregate([]))
+        ds.write_dataset(
+            table,
+            self.store_dir,
+            format="parquet",
+            partitioning=self._partitioning(),
+            existing_data_behavior="delete_matching",
+            max_partitions=max(1024, n_partitions),
+            basename_template="part-{i}.parquet",
+        )
+
+    def write(self, df: pd.DataFrame, required_cols: Sequence[str]) -> Path:
+        """Replace the whole store with ``df``."""
+        if self.store_dir.exists():
+            shutil.rmtree(self.store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._write_partitions(self._to_table(df, required_cols))
+
+        manifest = {
+            "columns": list(df.columns),
+            "required_cols": list(required_cols),
+            "partitioning": PARTITION_COLS,
+        }
+        self.manifest_path.write_text(json.dumps(manifest, indent=2))
+        print(f"[+] Saved feature store to: {self.store_dir} ({len(df)} rows)")
+        return self.store_dir
+
+    def upsert(self, df: pd.DataFrame) -> int:
+        """
+        Insert or replace rows keyed by (crypto_name, date).
+
+        Only the (crypto_name, year) partitions touched by ``df`` are read and
+        rewritten. Returns the number of partitions rewritten.
+        """
+        manifest = self.manifest()
+        new = df[manifest["columns"]]
+        keys = pd.DataFrame({"crypto_name": new["crypto_name"].astype(str), "year": new["date"].dt.year})
+        keys = keys.drop_duplicates()
+
+        predicate = (ds.field("crypto_name").isin(keys["crypto_name"].unique().tolist())
+                     & ds.field("year").isin(keys["year"].unique().tolist()))
+        existing = self.dataset().to_table(filter=predicate).to_pandas()
+        existing["crypto_name"] = existing["crypto_name"].astype(str)
+        # name/year isin() over-selects; keep only the partitions being rewritten
+        existing = existing.merge(keys, on=["crypto_name", "year"], how="inner")
+        merged = pd.concat([existing[manifest["columns"]], new], ignore_index=True)
+        merged = merged.drop_duplicates(subset=["crypto_name", "date"], keep="last")
+        merged = merged.sort_values(["crypto_name", "date"], kind="stable")
+
+        self._write_partitions(self._to_table(merged, manifest["required_cols"]))
+        print(f"[+] Upserted {len(new)} rows into {len(keys)} partitions of: {self.store_dir}")
+        return len(keys)
+
+    def manifest(self) -> dict:
+        if not self.exists():
+            raise FileNotFoundError(f"Feature store not found: {self.store_dir}. Run features.py first.")
+        return json.loads(self.manifest_path.read_text())
+
+    def dataset(self) -> ds.Dataset:
+        """Memory-mapped pyarrow dataset over all partitions."""
+        return ds.dataset(
+            self.store_dir,
+            format="parquet",
+            partitioning=self._partitioning(dictionary=True),
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+            exclude_invalid_files=True,
+        )
+
+    def read(
+        self,
+        columns: Optional[List[str]] = None,
+        model_ready: bool = False,
+        cryptos: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Read the feature table with column projection and predicate pushdown.
+
+        ``model_ready=True`` returns only rows usable for training (the old
+        crypto_features_model.csv). ``start``/``end`` bound ``date`` inclusively
+        and also prune year partitions. Rows come back sorted by crypto_name, date.
+        """
+        manifest = self.manifest()
+        columns = list(columns) if columns is not None else manifest["columns"]
+
+        filters = []
+        if model_ready:
+            filters.append(ds.field("model_ready"))
+        if cryptos is not None:
+            filters.append(ds.field("crypto_name").isin([str(c) for c in cryptos]))
+        if start is not None:
+            start = pd.Timestamp(start)
+            filters.append(ds.field("year") >= start.year)
+            filters.append(ds.field("date") >= pa.scalar(start.to_datetime64()))
+        if end is not None:
+            end = pd.Timestamp(end)
+            filters.append(ds.field("year") <= end.year)
+            filters.append(ds.field("date") <= pa.scalar(end.to_datetime64()))
+
+        predicate = None
+        for f in filters:
+            predicate = f if predicate is None else predicate & f
+
+        wanted = list(dict.fromkeys(columns + ["crypto_name", "date"]))
+        df = self.dataset().to_table(columns=wanted, filter=predicate).to_pandas()
+        # Partition discovery order is not alphabetical; sort like the rest of the project
+        df["crypto_name"] = df["crypto_name"].cat.set_categories(sorted(df["crypto_name"].cat.categories))
+        df = df.sort_values(["crypto_name", "date"], kind="stable").reset_index(drop=True)
+        return df[columns]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the feature store.")
+    parser.add_argument("--export-csv", type=Path, default=None,
+                        help="Write the model-ready rows to this CSV (e.g. to upload to the web app)")
+    parser.add_argument("--rows", type=int, default=None, help="Limit exported rows")
+    args = parser.parse_args()
+
+    store = FeatureStore()
+    df = store.read(model_ready=True)
+    print(f"🔹 Model-ready rows: {len(df)} | columns: {len(df.columns)}")
+    print(df.head())
+    if args.export_csv is not None:
+        out = df if args.rows is None else df.head(args.rows)
+        out.to_csv(args.export_csv, index=False)
+        print(f"✅ Exported {len(out)} rows to: {args.export_csv}")
@@ -0,0 +1,173 @@
+"""
+Hyperparameter Search
+---------------------
+Random search and successive halving over each candidate's ``search`` space
+(see candidates.py), on matrices that were transformed once.
+
+Successive halving samples ``n_trials`` configurations per candidate and
+fits them all on a small seeded sample of the training rows. Only the best
+``1/eta`` of them (by validation R²) move on to the next rung, which uses
+``eta`` times more rows, until the survivors train on every row. Most
+configurations are therefore only fitted on a fraction of the data. Boosted
+candidates also stop early on the validation rows, so the rounds they need
+are found instead of searched.
+
+All trials of a rung run in one process pool; the matrices are written to
+disk once and memory-mapped by every worker, like ``train_candidates``.
+"""
+
+import json
+import math
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from src.components.candidates import CANDIDATES, CandidateSpec, build_estimator, normalize_candidates
+from src.components.model_trainer import ModelTrainer
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+from src.utils.sharding import available_cores
+
+logger = get_logger(__name__)
+
+EARLY_STOPPING_ROUNDS = 20
+
+
+def sample_params(space: Dict[str, dict], rng: np.random.Generator) -> dict:
+    """One configuration drawn from a search space ({param: {"type", ...}})."""
+    params = {}
+    for name, dist in space.items():
+        kind = dist["type"]
+        if kind == "int":
+            params[name] = int(rng.integers(dist["low"], dist["high"] + 1))
+        elif kind == "float":
+            params[name] = float(rng.uniform(dist["low"], dist["high"]))
+        elif kind == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(dist["low"]), np.log(dist["high"]))))
+        elif kind == "choice":
+            params[name] = dist["options"][int(rng.integers(len(dist["options"])))]
+        else:
+            raise CustomException(f"Unknown search distribution: {kind}", errors={"param": name})
+    return params
+
+
+def rung_sizes(n_rows: int, n_configs: int, eta: int = 3, min_rows: int = 1000) -> List[int]:
+    """Training rows per rung: the last rung uses every row, each earlier one ``eta`` times fewer."""
+    n_rungs = 1 + int(math.floor(math.log(max(n_configs, 1), eta))) if n_configs > 1 else 1
+    sizes = [n_rows // eta ** (n_rungs - 1 - k) for k in range(n_rungs)]
+    # Drop rungs too small to say anything
+    return [s for s in sizes if s >= min(min_rows, n_rows)]
+
+
+def _fit_trial(name: str, params: dict, n_rows: int, n_jobs: int, data_path: str, artifacts_dir: str) -> dict:
+    """Pool worker: fit one configuration on the first ``n_rows`` of the row sample, score on validation."""
+    start = time.perf_counter()
+    with threadpool_limits(limits=n_jobs):
+        Xt_train, y_train, Xt_valid, y_valid, order = joblib.load(data_path, mmap_mode="r")
+        rows = np.sort(order[:n_rows])
+        X, y = Xt_train[rows], np.asarray(y_train)[rows]
+        spec = CANDIDATES[name]
+        fit_kwargs = {}
+        if spec.get("early_stopping"):
+            params = {**params, spec["early_stopping"]: EARLY_STOPPING_ROUNDS}
+            fit_kwargs = {"eval_set": [(Xt_valid, y_valid)], "verbose": False}
+        model = build_estimator(name, n_jobs=n_jobs, params=params)
+        model.fit(X, y, **fit_kwargs)
+        metrics = ModelTrainer(artifacts_dir=artifacts_dir).evaluate(y_valid, model.predict(Xt_valid))
+    best_iteration = getattr(model, "best_iteration", None) if fit_kwargs else None
+    return {"metrics": {k: float(v) for k, v in metrics.items()},
+            "best_iteration": None if best_iteration is None else int(best_iteration),
+            "seconds": time.perf_counter() - start}
+
+
+def run_search(Xt_train, y_train, Xt_valid, y_valid, candidates: Optional[CandidateSpec] = None,
+               n_trials: int = 27, method: str = "halving", eta: int = 3, min_rows: int = 1000,
+               n_cores: Optional[int] = None, seed: int = 42, artifacts_dir: str = "artifacts") -> dict:
+    """
+    Search every candidate's space and return {"leaderboard": DataFrame, "best": {name: params}}.
+
+    ``method="random"`` fits all ``n_trials`` configurations on every row;
+    ``"halving"`` runs successive halving with factor ``eta``. The returned
+    params are the best configuration of each candidate (with the early-stopped
+    number of rounds for boosted models), ready for ``train_candidates``.
+    """
+    if method not in ("halving", "random"):
+        raise CustomException(f"Unknown search method: {method}", errors={"available": ["halving", "random"]})
+    specs = normalize_candidates(candidates)
+    for name in specs:
+        if not CANDIDATES.get(name, {}).get("search"):
+            raise CustomException(f"Candidate has no search space: {name}",
+                                  errors={"searchable": sorted(n for n, c in CANDIDATES.items() if c.get("search"))})
+
+    rng = np.random.default_rng(seed)
+    n_rows = Xt_train.shape[0]
+    # Fixed-seed row order: every rung's sample contains the previous rung's
+    order = rng.permutation(n_rows)
+    sizes = rung_sizes(n_rows, n_trials, eta, min_rows) if method == "halving" else [n_rows]
+
+    # Trial id -> {"candidate", "params"}; the candidate's fixed overrides win over sampled values
+    trials = {}
+    for name, overrides in specs.items():
+        for i in range(n_trials):
+            trials[f"{name}-{i}"] = {"candidate": name,
+                                     "params": {**sample_params(CANDIDATES[name]["search"], rng), **overrides}}
+
+    n_cores = n_cores or available_cores()
+    start = time.perf_counter()
+    rows = []
+    alive = {name: [t for t, trial in trials.items() if trial["candidate"] == name] for name in specs}
+    with tempfile.TemporaryDirectory(prefix="search_") as tmp:
+        data_path = str(Path(tmp) / "matrices.joblib")
+        joblib.dump((Xt_train, np.asarray(y_train), Xt_valid, np.asarray(y_valid), order), data_path)
+
+        with ProcessPoolExecutor(max_workers=n_cores) as pool:
+            for rung, size in enumerate(sizes):
+                batch = [t for ids in alive.values() for t in ids]
+                n_jobs = max(1, n_cores // len(batch))
+                logger.info(f"Rung {rung}: {len(batch)} trials on {size} rows ({n_jobs} cores each)")
+                futures = {pool.submit(_fit_trial, trials[t]["candidate"], trials[t]["params"], size, n_jobs,
+                                       data_path, str(artifacts_dir)): t for t in batch}
+                scores = {}
+                for future in as_completed(futures):
+                    trial_id = futures[future]
+                    result = future.result()
+                    scores[trial_id] = result["metrics"]["r2"]
+                    trials[trial_id]["best_iteration"] = result["best_iteration"]
+                    rows.append({"trial": trial_id, "candidate": trials[trial_id]["candidate"], "rung": rung,
+                                 "n_rows": size, **result["metrics"], "seconds": result["seconds"],
+                                 "best_iteration": result["best_iteration"],
+                                 "params": json.dumps(trials[trial_id]["params"], default=str)})
+                if rung < len(sizes) - 1:
+                    # Each candidate keeps its best 1/eta (at least one)
+                    for name, ids in alive.items():
+                        ranked = sorted(ids, key=lambda t: scores[t], reverse=True)
+                        alive[name] = ranked[:max(1, len(ids) // eta)]
+
+    leaderboard = pd.DataFrame(rows).sort_values(["rung", "r2"], ascending=[False, False], kind="stable")
+    leaderboard = leaderboard.reset_index(drop=True)
+    best = {}
+    for name in specs:
+        final = leaderboard[(leaderboard["candidate"] == name) & (leaderboard["rung"] == len(sizes) - 1)]
+        trial = trials[final.iloc[0]["trial"]]
+        params = dict(trial["params"])
+        if trial.get("best_iteration") is not None:
+            # Refit without a validation set: keep the rounds early stopping chose
+            params["n_estimators"] = trial["best_iteration"] + 1
+        best[name] = params
+
+    out_dir = Path(artifacts_dir) / "search"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    leaderboard.to_csv(out_dir / "leaderboard.csv", index=False)
+    (out_dir / "best_params.json").write_text(json.dumps(best, indent=2, default=str))
+    # Work in units of one fit on every row
+    full_fit_equivalents = float(leaderboard["n_rows"].sum()) / n_rows
+    logger.info(f"Search ({method}) finished in {time.perf_counter() - start:.1f}s: {len(trials)} configurations, "
+                f"{full_fit_equivalents:.1f} full-fit equivalents; results in {out_dir}")
+    return {"leaderboard": leaderboard, "best": best}
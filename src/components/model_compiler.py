@@ -0,0 +1,305 @@
+"""
+Model Compiler
+--------------
+Exports a fitted best_pipeline (ColumnTransformer + RandomForest/XGBoost) to
+plain NumPy arrays and evaluates it without pandas/sklearn/xgboost:
+
+* median imputer + StandardScaler -> per-column fill, mean and scale vectors
+* most-frequent imputer + OneHotEncoder -> per-column fill and category lists;
+  a one-hot feature is evaluated as ``code == category`` on the fly, so the
+  wide one-hot matrix is never built
+* every tree -> contiguous left/right/feature/threshold/value node arrays
+
+Single-row and small-batch predictions skip DataFrame validation entirely.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Mapping, Union
+
+import numpy as np
+
+from src.utils.exception import CustomException
+
+# Smaller arrays (names, scalars) are read; mapping them would cost a page each
+MMAP_MIN_BYTES = 1 << 16
+
+
+def _flatten_sklearn_forest(estimators) -> Dict[str, np.ndarray]:
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    for est in estimators:
+        tree = est.tree_
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        value.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+    n_nodes = offset
+    return {
+        "left": np.concatenate(left).astype(np.int64),
+        "right": np.concatenate(right).astype(np.int64),
+        "feature": np.concatenate(feature).astype(np.int64),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.concatenate(value).astype(np.float64),
+        "default_left": np.zeros(n_nodes, dtype=bool),
+        "roots": np.asarray(roots, dtype=np.int64),
+    }
+
+
+def _flatten_xgboost(model) -> Dict[str, np.ndarray]:
+    booster = model.get_booster()
+    raw = json.loads(booster.save_raw("json"))
+    learner = raw["learner"]
+    if learner["objective"]["name"] != "reg:squarederror":
+        raise CustomException(f"Unsupported XGBoost objective: {learner['objective']['name']}")
+    gbm = learner["gradient_booster"]
+    if gbm.get("name") != "gbtree":
+        raise CustomException(f"Unsupported XGBoost booster: {gbm.get('name')}")
+
+    trees = gbm["model"]["trees"]
+    # Mirror XGBRegressor.predict(): stop at best_iteration when early stopping was used
+    best_iteration = getattr(model, "best_iteration", None)
+    if best_iteration is not None:
+        indptr = gbm["model"].get("iteration_indptr")
+        trees = trees[: indptr[best_iteration + 1]] if indptr else trees[: best_iteration + 1]
+
+    left, right, feature, threshold, value, default_left, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        lc = np.asarray(tree["left_children"], dtype=np.int64)
+        rc = np.asarray(tree["right_children"], dtype=np.int64)
+        is_leaf = lc == -1
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        roots.append(offset)
+        left.append(np.where(is_leaf, -1, lc + offset))
+        right.append(np.where(is_leaf, -1, rc + offset))
+        feature.append(np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int64)))
+        # Leaves keep their weight in split_conditions
+        threshold.append(cond.astype(np.float64))
+        value.append(np.where(is_leaf, cond, 0).astype(np.float64))
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        offset += len(lc)
+
+    base_score = learner["learner_model_param"]["base_score"].strip("[]")
+    return {
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "value": np.concatenate(value),
+        "default_left": np.concatenate(default_left),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "base_score": np.asarray(float(base_score), dtype=np.float64),
+    }
+
+
+def compile_pipeline(pipeline) -> "CompiledModel":
+    """Fold a fitted preprocessor + tree model pipeline into a CompiledModel."""
+    steps = getattr(pipeline, "named_steps", {})
+    preprocessor, model = steps.get("preprocessor"), steps.get("model")
+    if preprocessor is None or model is None:
+        raise CustomException("Expected a Pipeline with 'preprocessor' and 'model' steps")
+
+    arrays: Dict[str, np.ndarray] = {"num_fill": np.zeros(0), "num_mean": np.zeros(0), "num_scale": np.ones(0)}
+    num_cols, cat_cols = [], []
+    feat_kind, feat_src, feat_code = [], [], []
+    cat_categories, cat_offsets, cat_fill = [], [0], []
+    for name, transformer, cols in preprocessor.transformers_:
+        if name == "remainder" or transformer == "drop" or len(cols) == 0:
+            continue
+        if name == "num":
+            imputer, scaler = transformer.named_steps["imputer"], transformer.named_steps["scaler"]
+            arrays["num_fill"] = imputer.statistics_.astype(np.float64)
+            arrays["num_mean"] = scaler.mean_ if scaler.with_mean else np.zeros(len(cols))
+            arrays["num_scale"] = scaler.scale_ if scaler.with_std else np.ones(len(cols))
+            for i, col in enumerate(cols):
+                num_cols.append(col)
+                feat_kind.append(0), feat_src.append(i), feat_code.append(-1)
+        elif name == "cat":
+            imputer, encoder = transformer.named_steps["imputer"], transformer.named_steps["encoder"]
+            drop_idx = encoder.drop_idx_ if encoder.drop_idx_ is not None else [None] * len(cols)
+            for i, col in enumerate(cols):
+                cats = np.asarray(encoder.categories_[i]).astype(str)
+                cat_cols.append(col)
+                cat_fill.append(str(imputer.statistics_[i]))
+                cat_categories.append(cats)
+                cat_offsets.append(cat_offsets[-1] + len(cats))
+                for k in range(len(cats)):
+                    if drop_idx[i] is not None and k == drop_idx[i]:
+                        continue
+                    feat_kind.append(1), feat_src.append(i), feat_code.append(k)
+        else:
+            raise CustomException(f"Unsupported preprocessor step: {name}")
+
+    arrays.update({
+        "num_cols": np.asarray(num_cols, dtype=str),
+        "cat_cols": np.asarray(cat_cols, dtype=str),
+        "cat_fill": np.asarray(cat_fill, dtype=str),
+        "cat_categories": np.concatenate(cat_categories) if cat_categories else np.zeros(0, dtype=str),
+        "cat_offsets": np.asarray(cat_offsets, dtype=np.int64),
+        "feat_kind": np.asarray(feat_kind, dtype=np.int8),
+        "feat_src": np.asarray(feat_src, dtype=np.int64),
+        "feat_code": np.asarray(feat_code, dtype=np.int64),
+    })
+
+    model_name = type(model).__name__
+    if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+        arrays.update(_flatten_sklearn_forest(model.estimators_))
+        arrays["model_type"] = np.asarray("forest")
+    elif hasattr(model, "get_booster"):
+        arrays.update(_flatten_xgboost(model))
+        arrays["model_type"] = np.asarray("xgboost")
+        # Sparse matrices hide zeros, and XGBoost treats absent entries as missing
+        arrays["zero_is_missing"] = np.asarray(bool(getattr(preprocessor, "sparse_output_", False)))
+    else:
+        raise CustomException(f"Model type {model_name} cannot be compiled")
+    arrays["model_name"] = np.asarray(model_name)
+    return CompiledModel(arrays)
+
+
+class CompiledModel:
+    """NumPy-only evaluation of a compiled best_pipeline."""
+
+    def __init__(self, arrays: Mapping[str, np.ndarray]):
+        self.arrays = dict(arrays)
+        for key, value in self.arrays.items():
+            setattr(self, key, value)
+        self.model_type = str(self.arrays["model_type"])
+        self.zero_is_missing = bool(self.arrays.get("zero_is_missing", False))
+        self.feature_names = list(self.num_cols) + list(self.cat_cols)
+
+    def save(self, path) -> Path:
+        """Write one .npz file, or one .npy file per array when ``path`` has no suffix."""
+        path = Path(path)
+        if not path.suffix:
+            path.mkdir(parents=True, exist_ok=True)
+            for key, value in self.arrays.items():
+                np.save(path / f"{key}.npy", value, allow_pickle=False)
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as fh:
+            np.savez(fh, **self.arrays)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap: bool = False) -> "CompiledModel":
+        """
+        Load a saved model. For a directory of .npy files, ``mmap=True`` maps the
+        large arrays read-only instead of reading them: loading is near-instant
+        and processes serving the same files share their pages.
+        """
+        path = Path(path)
+        if path.is_dir():
+            arrays = {}
+            for file in path.glob("*.npy"):
+                mode = "r" if mmap and file.stat().st_size >= MMAP_MIN_BYTES else None
+                arrays[file.stem] = np.load(file, mmap_mode=mode, allow_pickle=False)
+            return cls(arrays)
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def _columns(self, data) -> int:
+        first = data[self.feature_names[0]]
+        return len(first) if np.ndim(first) else 1
+
+    def _transform(self, data):
+        """Imputed + scaled numeric block and category codes (-1 = unknown)."""
+        n = self._columns(data)
+        Z = np.empty((n, len(self.num_cols)), dtype=np.float64)
+        for i, col in enumerate(self.num_cols):
+            values = np.asarray(data[col], dtype=np.float64).reshape(-1)
+            Z[:, i] = np.where(np.isnan(values), self.num_fill[i], values)
+        Z -= self.num_mean
+        Z /= self.num_scale
+        # Trees compare float32 features (sklearn and XGBoost both cast)
+        Z = Z.astype(np.float32).astype(np.float64)
+
+        codes = np.empty((n, len(self.cat_cols)), dtype=np.int64)
+        for i, col in enumerate(self.cat_cols):
+            values = np.asarray(data[col], dtype=object).reshape(-1)
+            missing = np.equal(values, None) | (values != values)
+            values = np.where(missing, self.cat_fill[i], values).astype(str)
+            cats = self.cat_categories[self.cat_offsets[i]:self.cat_offsets[i + 1]]
+            pos = np.minimum(np.searchsorted(cats, values), len(cats) - 1)
+            codes[:, i] = np.where(cats[pos] == values, pos, -1)
+        return Z, codes
+
+    def predict(self, data: Union[Mapping, "object"]) -> np.ndarray:
+        """
+        Predict from a DataFrame, a mapping of column -> values, or one record
+        (mapping of column -> scalar). Extra columns are ignored.
+        """
+        Z, codes = self._transform(data)
+        n, n_trees = len(Z), len(self.roots)
+        node = np.tile(self.roots, n)
+        row = np.repeat(np.arange(n), n_trees)
+        is_forest = self.model_type == "forest"
+
+        active = np.flatnonzero(self.left[node] != -1)
+        while active.size:
+            nd = node[active]
+            f = self.feature[nd]
+            r = row[active]
+            numeric = self.feat_kind[f] == 0
+            values = np.empty(active.size, dtype=np.float64)
+            values[numeric] = Z[r[numeric], self.feat_src[f[numeric]]]
+            onehot = ~numeric
+            values[onehot] = codes[r[onehot], self.feat_src[f[onehot]]] == self.feat_code[f[onehot]]
+
+            if is_forest:
+                go_left = values <= self.threshold[nd]
+            else:
+                go_left = values < self.threshold[nd]
+                missing = np.isnan(values)
+                if self.zero_is_missing:
+                    missing |= values == 0
+                go_left = np.where(missing, self.default_left[nd], go_left)
+            node[active] = np.where(go_left, self.left[nd], self.right[nd])
+            active = active[self.left[node[active]] != -1]
+
+        leaves = self.value[node].reshape(n, n_trees)
+        if is_forest:
+            return leaves.mean(axis=1)
+        return (leaves.sum(axis=1) + self.base_score).astype(np.float32)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import pandas as pd
+    from src.feature_spec import NON_FEATURE_COLS
+    from src.components.feature_store import FeatureStore
+    from src.components.model_store import ModelStore
+
+    # Export the registry's current pipeline, check parity and time both paths
+    store = ModelStore()
+    pipeline = store.load_pipeline()
+    compiled = compile_pipeline(pipeline)
+    out_path = compiled.save(Path(tempfile.mkdtemp()) / "compiled")
+    compiled = CompiledModel.load(out_path, mmap=True)
+    print(f"✅ Exported {compiled.model_name} ({len(compiled.roots)} trees, {len(compiled.left)} nodes) to: {out_path}")
+
+    X = FeatureStore().read(model_ready=True).drop(columns=NON_FEATURE_COLS)
+    X = pd.concat([X] * (100_000 // len(X) + 1), ignore_index=True).head(100_000)
+    expected = pipeline.predict(X)
+    result = compiled.predict(X)
+    np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-7)
+    print(f"🔹 Parity OK on {len(X)} rows (max abs diff {np.max(np.abs(result - expected)):.2e})")
+
+    for batch in (1, 100, 100_000):
+        sample = X.head(batch)
+        record = {c: sample[c].to_numpy() for c in compiled.feature_names}
+        repeats = max(1, 2000 // batch) if batch < 100_000 else 1
+        start = time.perf_counter()
+        for _ in range(repeats):
+            pipeline.predict(sample)
+        sk_time = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            compiled.predict(record)
+        np_time = (time.perf_counter() - start) / repeats
+        print(f"batch {batch:>6}: pipeline {sk_time * 1e3:8.2f} ms | compiled {np_time * 1e3:8.2f} ms")
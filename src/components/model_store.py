@@ -0,0 +1,169 @@
+"""
+Model Store
+-----------
+Versioned, content-addressed model registry on disk::
+
+    artifacts/models/registry/
+        CURRENT                 # version being served, replaced atomically
+        <version>/
+            pipeline.joblib     # uncompressed joblib dump, arrays loadable with mmap_mode="r"
+            compiled/*.npy      # CompiledModel arrays, memory-mapped when loaded
+            manifest.json       # metrics, feature columns, training data range, ...
+
+A version is the first 12 hex digits of the SHA-256 of its pipeline.joblib,
+so publishing an identical model again is a no-op and a version's files never
+change. That makes them safe to map read-only: every process serving a
+version shares the same page-cache pages, and a cold start only opens files.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from src.components.model_compiler import CompiledModel
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PIPELINE_FILE = "pipeline.joblib"
+COMPILED_DIR = "compiled"
+MANIFEST_FILE = "manifest.json"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    def __init__(self, artifacts_dir: str = "artifacts"):
+        self.artifacts_dir = Path(artifacts_dir)
+        self.registry_dir = self.artifacts_dir / "models" / "registry"
+        self.current_path = self.registry_dir / "CURRENT"
+
+    def version_dir(self, version: str) -> Path:
+        return self.registry_dir / version
+
+    def exists(self, version: str) -> bool:
+        return (self.version_dir(version) / MANIFEST_FILE).exists()
+
+    def publish(self, pipeline, manifest: Optional[dict] = None, compiled: Optional[CompiledModel] = None,
+                make_current: bool = True) -> str:
+        """
+        Store a fitted pipeline (and its compiled export) as a new version and return it.
+
+        ``manifest`` holds whatever describes the model (metrics, feature
+        columns, data range); ``make_current`` also points CURRENT at it.
+        """
+        import joblib
+
+        self.registry_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.registry_dir / f".tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        tmp_dir.mkdir()
+        try:
+            # No compression: joblib can then map the arrays instead of reading them
+            joblib.dump(pipeline, tmp_dir / PIPELINE_FILE)
+            version = _sha256(tmp_dir / PIPELINE_FILE)[:12]
+            if compiled is not None:
+                compiled.save(tmp_dir / COMPILED_DIR)
+            steps = getattr(pipeline, "named_steps", {})
+            meta = {"version": version, "created": time.time(),
+                    "model_name": type(steps.get("model", pipeline)).__name__,
+                    "compiled": compiled is not None, **(manifest or {})}
+            (tmp_dir / MANIFEST_FILE).write_text(json.dumps(meta, indent=2, default=str))
+
+            if self.exists(version):
+                logger.info(f"Model {version} already in the registry")
+            else:
+                # A directory rename is atomic: readers see a complete version or none
+                try:
+                    os.rename(tmp_dir, self.version_dir(version))
+                except OSError:
+                    if not self.exists(version):
+                        raise
+                    # Published concurrently with the same content
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        if make_current:
+            self.set_current(version)
+        logger.info(f"✅ Published model {version} to: {self.version_dir(version)}")
+        return version
+
+    def set_current(self, version: str):
+        """Point CURRENT at ``version`` (also used to roll back)."""
+        if not self.exists(version):
+            raise CustomException(f"Unknown model version: {version}", errors={"available": self.versions()})
+        tmp = self.current_path.with_name(f".CURRENT.{os.getpid()}.tmp")
+        tmp.write_text(version)
+        os.replace(tmp, self.current_path)
+
+    def current_version(self) -> Optional[str]:
+        try:
+            version = self.current_path.read_text().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def _resolve(self, version: Optional[str]) -> str:
+        version = version or self.current_version()
+        if version is None or not self.exists(version):
+            raise CustomException(f"Model version not found: {version}", errors={"registry": str(self.registry_dir)})
+        return version
+
+    def manifest(self, version: Optional[str] = None) -> dict:
+        return json.loads((self.version_dir(self._resolve(version)) / MANIFEST_FILE).read_text())
+
+    def versions(self) -> List[str]:
+        """Published versions, oldest first."""
+        if not self.registry_dir.exists():
+            return []
+        found = [p.name for p in self.registry_dir.iterdir() if (p / MANIFEST_FILE).exists()]
+        return sorted(found, key=lambda v: self.manifest(v)["created"])
+
+    def pipeline_path(self, version: Optional[str] = None) -> Path:
+        return self.version_dir(self._resolve(version)) / PIPELINE_FILE
+
+    def load_pipeline(self, version: Optional[str] = None, mmap: bool = True):
+        """Unpickle the sklearn pipeline; with ``mmap`` its NumPy arrays map the file read-only."""
+        import joblib
+        return joblib.load(self.pipeline_path(version), mmap_mode="r" if mmap else None)
+
+    def load_compiled(self, version: Optional[str] = None, mmap: bool = True) -> Optional[CompiledModel]:
+        """The version's CompiledModel, or None when it was not compiled."""
+        compiled_dir = self.version_dir(self._resolve(version)) / COMPILED_DIR
+        if not compiled_dir.is_dir():
+            return None
+        return CompiledModel.load(compiled_dir, mmap=mmap)
+
+    def prune(self, keep: int = 5) -> List[str]:
+        """Delete all but the ``keep`` newest versions; CURRENT is always kept. Returns removed versions."""
+        current = self.current_version()
+        versions = self.versions()
+        removed = [v for v in versions[:max(0, len(versions) - keep)] if v != current]
+        for version in removed:
+            # Processes still mapping these files keep them until they unmap (POSIX)
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
+        if removed:
+            logger.info(f"Pruned model versions: {removed}")
+        return removed
+
+
+if __name__ == "__main__":
+    store = ModelStore()
+    current = store.current_version()
+    print("Versions:", store.versions(), "| current:", current)
+    if current is not None:
+        start = time.perf_counter()
+        compiled = store.load_compiled()
+        print(f"✅ Mapped compiled model in {(time.perf_counter() - start) * 1000:.1f} ms:",
+              store.manifest()["model_name"], "compiled" if compiled is not None else "(no compiled export)")
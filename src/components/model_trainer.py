@@ -6,16 +6,20 @@ Model Trainer
 This module trains and evaluates models, and saves the best pipeline.
 """
 
+import os
 from pathlib import Path
 import joblib
 import numpy as np
-from typing import Dict
-from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 # Import helpers
+from src.components.model_store import ModelStore
 from src.utils.utils import create_dir
 from src.utils.logger import get_logger
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 # Initialize logger
 logger = get_logger(__name__)
 
@@ -28,22 +32,61 @@ class ModelTrainer:
 
     def evaluate(self, y_true, y_pred) -> Dict[str, float]:
         """Evaluate predictions with RMSE, MAE, and R²."""
+        from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
+
         mse = mean_squared_error(y_true, y_pred)
         rmse = np.sqrt(mse)
         mae = mean_absolute_error(y_true, y_pred)
         r2 = r2_score(y_true, y_pred)
         return {"rmse": rmse, "mae": mae, "r2": r2}
 
+    def evaluate_report(self, y_true, y_pred, groups=None, dates=None, period: Optional[str] = "M",
+                        n_boot: int = 1000, alpha: float = 0.05) -> Dict[str, "pd.DataFrame"]:
+        """
+        ``evaluate`` broken down per crypto and per period, with bootstrap
+        confidence intervals (see src/components/evaluation.py).
+        """
+        from src.components.evaluation import evaluation_report
+
+        return evaluation_report(y_true, y_pred, groups=groups, dates=dates, period=period,
+                                 n_boot=n_boot, alpha=alpha)
+
+    def save_report(self, report: Dict[str, "pd.DataFrame"], name: str = "test") -> Path:
+        """Write each table of an ``evaluate_report`` to artifacts/evaluation/<name>/<table>.csv."""
+        out_dir = self.artifacts_dir / "evaluation" / name
+        create_dir(out_dir)
+        for table, frame in report.items():
+            frame.to_csv(out_dir / f"{table}.csv", index=False)
+        logger.info(f"✅ Saved evaluation report to: {out_dir}")
+        return out_dir
+
     def save_model(self, pipeline, filename: str = "best_model.joblib") -> Path:
         """Save trained pipeline to artifacts/models/"""
         out_path = self.model_dir / filename
-        joblib.dump(pipeline, out_path)
+        # Write then rename so a serving process never reads a half-written file
+        tmp_path = out_path.with_name(f".{filename}.tmp")
+        joblib.dump(pipeline, tmp_path)
+        os.replace(tmp_path, out_path)
         logger.info(f"✅ Saved model pipeline to: {out_path}")
         return out_path
 
-    def load_model(self, filepath: str):
-        """Load trained pipeline from file"""
-        return joblib.load(filepath)
+    def publish_model(self, pipeline, metrics: Dict[str, float], feature_columns: List[str],
+                      data_range: Optional[dict] = None, compiled=None, **extra) -> str:
+        """
+        Store a pipeline as a new version in the model registry and make it current.
+
+        The manifest records ``metrics`` (from ``evaluate``), the input feature
+        columns and the training data range. Returns the version.
+        """
+        manifest = {"metrics": {k: float(v) for k, v in metrics.items()},
+                    "feature_columns": list(feature_columns), "data_range": data_range or {}, **extra}
+        return ModelStore(artifacts_dir=self.artifacts_dir).publish(pipeline, manifest, compiled=compiled)
+
+    def load_model(self, filepath: Optional[str] = None, mmap: bool = True):
+        """Load a trained pipeline from file, or the registry's current version when no path is given."""
+        if filepath is None:
+            return ModelStore(artifacts_dir=self.artifacts_dir).load_pipeline(mmap=mmap)
+        return joblib.load(filepath, mmap_mode="r" if mmap else None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+"""
+Feature Specification
+---------------------
+Declarative description of the engineered features. Every feature names its
+operation, its inputs (raw columns or other features) and, for rolling
+features, its window; ``build_features()`` generates the usual families for
+any window sets.
+
+``FeatureSpec.compute()`` evaluates only the selected features and what they
+depend on, each intermediate once. All windows over the same input share one
+``SegmentedRolling`` (its prefix sums), so ten windows cost one prefix-sum
+pass plus O(n) per window rather than ten full passes.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.utils.exception import CustomException
+from src.utils.metrics import span
+from src.utils.rolling import SegmentedRolling, segmented_diff, segmented_shift
+
+RAW_INPUTS = ["close", "high", "low", "volume", "marketCap"]
+# Helper features kept in the table but not needed for a row to be model-ready
+HELPER_FEATURES = ["log_price", "tr"]
+TARGET_COL = "vol_7d_target_next"
+# Columns of a feature table that are never model inputs, in training and prediction alike
+NON_FEATURE_COLS = [TARGET_COL, "date", "timestamp"]
+
+
+def build_features(vol_windows: Iterable[int] = (7, 30), ma_windows: Iterable[int] = (7, 30),
+                   atr_windows: Iterable[int] = (14,), target: str = "vol_7d") -> Dict[str, dict]:
+    """
+    Feature definitions {name: {"op", "inputs", "window"}} in column order.
+
+    ``target`` is the feature whose next-day value becomes ``<target>_target_next``.
+    The defaults reproduce the original fixed feature set.
+    """
+    features = {
+        "log_price": {"op": "log1p", "inputs": ["close"]},
+        "log_return": {"op": "diff", "inputs": ["log_price"]},
+    }
+    for w in vol_windows:
+        features[f"vol_{w}d"] = {"op": "rolling_std", "inputs": ["log_return"], "window": int(w)}
+    for w in ma_windows:
+        features[f"ma_{w}"] = {"op": "rolling_mean", "inputs": ["close"], "window": int(w)}
+    features["liquidity"] = {"op": "ratio", "inputs": ["volume", "marketCap"]}
+    features["tr"] = {"op": "true_range", "inputs": ["high", "low", "close"]}
+    for w in atr_windows:
+        features[f"atr_{w}"] = {"op": "rolling_mean", "inputs": ["tr"], "window": int(w)}
+    if target not in features:
+        raise CustomException(f"Unknown target feature: {target}", errors={"available": list(features)})
+    features[f"{target}_target_next"] = {"op": "lead", "inputs": [target]}
+    return features
+
+
+class FeatureSpec:
+    """
+    A set of feature definitions plus the subset to compute.
+
+    ``select=None`` computes every defined feature. Dependencies of selected
+    features are computed as intermediates but not returned.
+    """
+
+    def __init__(self, features: Optional[Dict[str, dict]] = None, select: Optional[Sequence[str]] = None):
+        self.features = dict(features) if features is not None else build_features()
+        unknown = [name for name in (select or []) if name not in self.features]
+        if unknown:
+            raise CustomException(f"Unknown features: {unknown}", errors={"available": list(self.features)})
+        wanted = set(select) if select is not None else set(self.features)
+        self.output_cols = [name for name in self.features if name in wanted]
+        self.plan = self._resolve(self.output_cols)
+
+    def _resolve(self, names: List[str]) -> List[str]:
+        """Features to evaluate, dependencies first (depth-first, cycles rejected)."""
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str):
+            if name in order or name in RAW_INPUTS:
+                return
+            if name not in self.features:
+                raise CustomException(f"Feature depends on unknown input: {name}",
+                                      errors={"raw_inputs": RAW_INPUTS, "features": list(self.features)})
+            if name in visiting:
+                raise CustomException(f"Circular feature dependency at: {name}")
+            visiting.add(name)
+            for dep in self.features[name]["inputs"]:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
+
+    @property
+    def raw_inputs(self) -> List[str]:
+        """Raw columns the plan reads, in RAW_INPUTS order."""
+        used = {dep for name in self.plan for dep in self.features[name]["inputs"]}
+        return [c for c in RAW_INPUTS if c in used]
+
+    @property
+    def required_cols(self) -> List[str]:
+        """Selected features that must be non-null for a row to be model-ready."""
+        return [c for c in self.output_cols if c not in HELPER_FEATURES]
+
+    def lookback(self, name: str) -> int:
+        """Previous rows of the same crypto that ``name`` reads on a given row."""
+        if name in RAW_INPUTS:
+            return 0
+        feature = self.features[name]
+        own = {"diff": 1, "true_range": 1, "rolling_mean": feature.get("window", 1) - 1,
+               "rolling_std": feature.get("window", 1) - 1}.get(feature["op"], 0)
+        return own + max(self.lookback(dep) for dep in feature["inputs"])
+
+    @property
+    def state_rows(self) -> int:
+        """Raw bars to keep per crypto for incremental updates (see src/features.py)."""
+        # The last saved bar is re-emitted with its target, so it needs its own full window too
+        return max([self.lookback(name) for name in self.plan] or [0]) + 1
+
+    def compute(self, inputs: Dict[str, np.ndarray], offsets: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Evaluate the plan on segment-sorted float64 arrays.
+
+        ``inputs`` maps raw column names to arrays; returns {column: array} for
+        ``output_cols``, in that order.
+        """
+        values: Dict[str, np.ndarray] = dict(inputs)
+        rolling: Dict[str, SegmentedRolling] = {}
+
+        def roll(name: str) -> SegmentedRolling:
+            # One set of prefix sums per input column, shared by every window over it
+            if name not in rolling:
+                rolling[name] = SegmentedRolling(values[name], offsets)
+            return rolling[name]
+
+        for name in self.plan:
+            with span(f"feature.{name}"):
+                values[name] = self._evaluate(name, values, roll, offsets)
+        return {name: values[name] for name in self.output_cols}
+
+    def _evaluate(self, name: str, values: Dict[str, np.ndarray], roll, offsets: np.ndarray) -> np.ndarray:
+        feature = self.features[name]
+        args = feature["inputs"]
+        op = feature["op"]
+        if op == "log1p":
+            out = np.log1p(values[args[0]])
+        elif op == "diff":
+            out = segmented_diff(values[args[0]], offsets)
+        elif op == "rolling_mean":
+            out = roll(args[0]).mean(feature["window"])
+        elif op == "rolling_std":
+            out = roll(args[0]).std(feature["window"])
+        elif op == "ratio":
+            # Avoid division by zero
+            num, den = values[args[0]], values[args[1]]
+            out = num / (np.where(den == 0, np.nan, den) + 1e-9)
+        elif op == "true_range":
+            high, low, close = (values[a] for a in args)
+            # Previous close never crosses cryptos
+            prev_close = segmented_shift(close, offsets, 1)
+            out = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+        elif op == "lead":
+            out = segmented_shift(values[args[0]], offsets, -1)
+        else:
+            raise CustomException(f"Unknown feature op: {op}", errors={"feature": name})
+        return out
+
+    def to_dict(self) -> dict:
+        return {"features": self.features, "select": self.output_cols}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureSpec":
+        return cls(features=data["features"], select=data["select"])
+
+
+DEFAULT_SPEC = FeatureSpec()
@@ -4,25 +4,54 @@ Feature engineering script for Crypto Volatility project.
 
 Usage:
     conda activate crypto_volatility_env
-    python src/features.py
+    python -m src.features
 
 This script expects: data/crypto_prices.csv
-It produces: artifacts/crypto_features_full.csv and artifacts/crypto_features_model.csv
+It produces: artifacts/feature_store/ (Parquet, partitioned by crypto_name/year; the
+model-ready rows are flagged by its `model_ready` column)
+
+Sharded across processes (cryptos split by row count):
+    python -m src.features --workers 8
+
+Other window sets, or only some features (see src/feature_spec.py):
+    python -m src.features --vol-windows 3,7,14,30,60,90,180 --features vol_7d,vol_90d,vol_7d_target_next
+
+Incremental mode (only new daily bars, after one full run has saved the state; uses its spec):
+    python -m src.features --incremental data/new_prices.csv
 """
 
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+import joblib
 import numpy as np
 import pandas as pd
 from typing import Optional
 
+from src.components.data_ingestion import DataIngestion
+from src.components.feature_store import FeatureStore
+from src.feature_spec import DEFAULT_SPEC, FeatureSpec, build_features
+from src.utils.metrics import enable_spans, save_spans, span
+from src.utils.rolling import segment_offsets
+from src.utils.sharding import SharedArray, available_cores, balance_shards, segment_rows
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 
+# Columns added by feature_engineer() with the default spec (see src/feature_spec.py)
+ENGINEERED_COLS = DEFAULT_SPEC.output_cols
+# Rows with NaN in any of these are left out of the model-ready table
+REQUIRED_COLS = DEFAULT_SPEC.required_cols
+# Raw bars kept per crypto for incremental updates: the longest window (30) needs
+# 29 previous returns, i.e. 30 previous closes, and the last saved bar is
+# re-emitted with its target, so it needs its own full window too
+STATE_ROWS = DEFAULT_SPEC.state_rows
 
-def load_data(path: Optional[Path] = None) -> pd.DataFrame:
-    """Load the raw CSV into a DataFrame."""
+
+def load_data(path: Optional[Path] = None, **filters) -> pd.DataFrame:
+    """Load the raw CSV with the declared schema (see DataIngestion.load_data for filters)."""
     if path is None:
         path = PROJECT_ROOT / "data" / "crypto_prices.csv"
-    return pd.read_csv(path)
+    return DataIngestion(data_path=path, artifacts_dir=PROJECT_ROOT / "artifacts").load_data(**filters)
 
 
 def ensure_datetime(crypto_prices: pd.DataFrame) -> pd.DataFrame:
@@ -37,12 +66,84 @@ def ensure_datetime(crypto_prices: pd.DataFrame) -> pd.DataFrame:
     return crypto_prices
 
 
-def feature_engineer(crypto_prices: pd.DataFrame) -> pd.DataFrame:
+def _feature_shard(inputs_spec, output_spec, offsets: np.ndarray, segments: np.ndarray, spec: FeatureSpec) -> int:
+    """Worker: compute the features of ``segments`` and write them into the shared output table."""
+    inputs = SharedArray.attach(*inputs_spec)
+    output = SharedArray.attach(*output_spec)
+    try:
+        rows, local_offsets = segment_rows(offsets, segments)
+        gathered = inputs.array[:, rows]
+        features = spec.compute(dict(zip(spec.raw_inputs, gathered)), local_offsets)
+        for k, col in enumerate(spec.output_cols):
+            output.array[k, rows] = features[col]
+    finally:
+        inputs.close()
+        output.close()
+    return len(rows)
+
+
+def _compute_sharded(spec: FeatureSpec, inputs: np.ndarray, offsets: np.ndarray, n_workers: int) -> dict:
+    """
+    Run ``spec.compute()`` over cryptos split into ``n_workers`` shards of similar row counts.
+
+    Inputs and the (feature x row) output table live in shared memory; workers
+    receive only block names and their segment ids, and write their rows in place.
+    """
+    shards = balance_shards(np.diff(offsets), n_workers)
+    n_out = len(spec.output_cols)
+    with SharedArray(inputs.shape) as shared_in, SharedArray((n_out, inputs.shape[1])) as shared_out:
+        shared_in.array[:] = inputs
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [pool.submit(_feature_shard, shared_in.spec, shared_out.spec, offsets, shard, spec)
+                       for shard in shards]
+            for future in as_completed(futures):
+                future.result()
+        return {col: shared_out.array[k].copy() for k, col in enumerate(spec.output_cols)}
+
+
+def feature_engineer(crypto_prices: pd.DataFrame, n_workers: int = 1,
+                     spec: Optional[FeatureSpec] = None) -> pd.DataFrame:
     """
     Add features useful for volatility prediction.
 
     Uses the variable name crypto_prices throughout (as you requested).
     Assumes columns: ['open','high','low','close','volume','marketCap','timestamp','crypto_name','date']
+
+    The frame is sorted once; the features of ``spec`` (default: the original
+    7/30-day set, see src/feature_spec.py) are then computed on plain NumPy
+    arrays using the segment offsets of each crypto (see src/utils/rolling.py).
+    With ``n_workers > 1`` the cryptos are sharded across processes that write
+    into one shared-memory output table (see src/utils/sharding.py).
+    Output matches _feature_engineer_pandas() up to floating point round-off.
+    """
+    # 1) Sort by crypto and date to make rolling ops correct within each crypto
+    crypto_prices = crypto_prices.sort_values(['crypto_name', 'date']).reset_index(drop=True)
+    # groupby() drops rows without a crypto_name, so the original output did too
+    if crypto_prices['crypto_name'].isna().any():
+        crypto_prices = crypto_prices[crypto_prices['crypto_name'].notna()].copy()
+    offsets = segment_offsets(crypto_prices['crypto_name'].to_numpy())
+
+    # 2) Per-crypto features on float64 arrays (inputs may be stored as float32); only
+    #    the requested features and their dependencies are computed
+    spec = spec or DEFAULT_SPEC
+    inputs = [crypto_prices[c].to_numpy(dtype=np.float64) for c in spec.raw_inputs]
+    n_workers = max(1, min(n_workers, len(offsets) - 1))
+    if n_workers > 1:
+        features = _compute_sharded(spec, np.stack(inputs), offsets, n_workers)
+    else:
+        features = spec.compute(dict(zip(spec.raw_inputs, inputs)), offsets)
+
+    # 3) (Optional) drop any helper columns you don't want saved, e.g. keep 'tr' or drop it
+    # features.pop('tr')
+
+    return crypto_prices.assign(**features)
+
+
+def _feature_engineer_pandas(crypto_prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Original groupby/apply implementation of feature_engineer().
+
+    Kept as the reference for parity checks and before/after timings.
     """
     # 1) Sort by crypto and date to make rolling ops correct within each crypto
     crypto_prices = crypto_prices.sort_values(['crypto_name', 'date']).reset_index(drop=True)
@@ -92,37 +193,175 @@ def feature_engineer(crypto_prices: pd.DataFrame) -> pd.DataFrame:
     return crypto_prices
 
 
-def save_processed(crypto_prices: pd.DataFrame):
-    """Save both a full feature file and a model-ready file (rows with NaNs dropped)."""
-    out_dir = PROJECT_ROOT / "artifacts"
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    full_path = out_dir / "crypto_features_full.csv"
-    crypto_prices.to_csv(full_path, index=False)
-    print(f"[+] Saved full feature table to: {full_path}")
+def save_processed(crypto_prices: pd.DataFrame, spec: Optional[FeatureSpec] = None,
+                   artifacts_dir: Optional[Path] = None):
+    """Save the feature table; model-ready rows (no NaNs in the spec's required columns) are flagged, not copied."""
+    required_cols = (spec or DEFAULT_SPEC).required_cols
+    store = FeatureStore(artifacts_dir=artifacts_dir or PROJECT_ROOT / "artifacts")
+    store.write(crypto_prices, required_cols=required_cols)
 
     # For model training we typically drop rows where engineered features or the target are NaN
-    required_cols = ['log_return', 'vol_7d', 'ma_7', 'ma_30', 'liquidity', 'atr_14', 'vol_7d_target_next']
-    model_df = crypto_prices.dropna(subset=required_cols)
-    model_path = out_dir / "crypto_features_model.csv"
-    model_df.to_csv(model_path, index=False)
-    print(f"[+] Saved model-ready table to: {model_path} (rows with NA in required cols dropped)")
-    print(f"[+] Rows retained for modeling: {len(model_df)} / {len(crypto_prices)}")
+    n_ready = int(crypto_prices[required_cols].notna().all(axis=1).sum())
+    print(f"[+] Rows retained for modeling: {n_ready} / {len(crypto_prices)}")
+
+
+def build_state(crypto_prices: pd.DataFrame, spec: Optional[FeatureSpec] = None) -> pd.DataFrame:
+    """
+    Keep the last ``spec.state_rows`` raw bars of every crypto (STATE_ROWS by default).
+
+    This is all the history the spec's windows and the previous close need, so
+    new bars can be featurized without touching older rows. The spec is kept in
+    the state's ``attrs`` so incremental runs compute the same features.
+    """
+    spec = spec or DEFAULT_SPEC
+    crypto_prices = crypto_prices.sort_values(['crypto_name', 'date'])
+    offsets = segment_offsets(crypto_prices['crypto_name'].to_numpy())
+    ends = np.repeat(offsets[1:], np.diff(offsets))
+    keep = np.arange(len(crypto_prices)) >= ends - spec.state_rows
+    raw_cols = [c for c in crypto_prices.columns if c not in spec.features]
+    state = crypto_prices.loc[keep, raw_cols].reset_index(drop=True)
+    state.attrs["feature_spec"] = spec.to_dict()
+    return state
+
+
+def state_spec(state: pd.DataFrame) -> FeatureSpec:
+    """Feature spec a saved state was built with (states saved before specs existed use the default)."""
+    if "feature_spec" in state.attrs:
+        return FeatureSpec.from_dict(state.attrs["feature_spec"])
+    return DEFAULT_SPEC
+
+
+def save_state(state: pd.DataFrame, path: Optional[Path] = None) -> Path:
+    if path is None:
+        path = PROJECT_ROOT / "artifacts" / "feature_state.joblib"
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(state, path)
+    print(f"[+] Saved rolling state for {state['crypto_name'].nunique()} cryptos to: {path}")
+    return Path(path)
+
+
+def load_state(path: Optional[Path] = None) -> pd.DataFrame:
+    if path is None:
+        path = PROJECT_ROOT / "artifacts" / "feature_state.joblib"
+    if not Path(path).exists():
+        raise FileNotFoundError(f"No feature state at {path}; run a full `python -m src.features` first")
+    return joblib.load(path)
+
+
+def update_features(new_rows: pd.DataFrame, state: pd.DataFrame):
+    """
+    Featurize only the new bars, using the saved per-crypto state and its spec.
+
+    Returns (updated_rows, new_state). updated_rows holds every new bar plus the
+    previous last bar of each touched crypto, whose vol_7d_target_next is now
+    known. Cost is O(new rows + STATE_ROWS per touched crypto).
+    """
+    spec = state_spec(state)
+    new_rows = ensure_datetime(new_rows.copy())
+    touched = state[state['crypto_name'].isin(new_rows['crypto_name'].unique())]
+
+    last_seen = touched.groupby('crypto_name', observed=True)['date'].max()
+    first_new = new_rows.groupby('crypto_name', observed=True)['date'].min()
+    stale = first_new.index[first_new.le(last_seen.reindex(first_new.index))]
+    if len(stale):
+        raise ValueError(f"New rows are not after the saved state for: {list(stale)}; run a full rebuild")
+
+    combined = pd.concat([touched.assign(_from_state=True), new_rows.assign(_from_state=False)],
+                         ignore_index=True)
+    featured = feature_engineer(combined, spec=spec)
+
+    # Previous last bar per crypto: its next-day target is filled in now
+    from_state = featured['_from_state'].to_numpy(dtype=bool)
+    next_is_new = np.zeros(len(featured), dtype=bool)
+    next_is_new[:-1] = from_state[:-1] & ~from_state[1:]
+    same_crypto = np.zeros(len(featured), dtype=bool)
+    same_crypto[:-1] = featured['crypto_name'].to_numpy()[:-1] == featured['crypto_name'].to_numpy()[1:]
+    updated_rows = featured[~from_state | (next_is_new & same_crypto)].drop(columns='_from_state')
+
+    untouched = state[~state['crypto_name'].isin(new_rows['crypto_name'].unique())]
+    new_state = pd.concat([untouched, build_state(featured.drop(columns='_from_state'), spec)], ignore_index=True)
+    new_state.attrs["feature_spec"] = spec.to_dict()
+    return updated_rows.reset_index(drop=True), new_state
+
+
+def save_incremental(updated_rows: pd.DataFrame):
+    """
+    Write the output of update_features() into the feature store.
+
+    Re-emitted (crypto_name, date) rows replace the stored ones; only the
+    touched crypto/year partitions are rewritten.
+    """
+    store = FeatureStore(artifacts_dir=PROJECT_ROOT / "artifacts")
+    store.upsert(updated_rows)
+    required_cols = store.manifest()["required_cols"]
+    n_ready = int(updated_rows[required_cols].notna().all(axis=1).sum())
+    print(f"[+] Model-ready rows among them: {n_ready}")
+
+
+def load_features(model_ready: bool = False, **kwargs) -> pd.DataFrame:
+    """Load the feature table from the store (see FeatureStore.read for filters)."""
+    store = FeatureStore(artifacts_dir=PROJECT_ROOT / "artifacts")
+    return store.read(model_ready=model_ready, **kwargs)
+
+
+def _windows(text: str):
+    return tuple(int(w) for w in text.split(",") if w)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Build crypto volatility features.")
+    parser.add_argument("--incremental", type=Path, default=None,
+                        help="CSV with only the new bars; updates the saved tables in place")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes to shard the cryptos across (0 = all available cores)")
+    parser.add_argument("--vol-windows", type=_windows, default=(7, 30), help="e.g. 3,7,14,30,60")
+    parser.add_argument("--ma-windows", type=_windows, default=(7, 30))
+    parser.add_argument("--atr-windows", type=_windows, default=(14,))
+    parser.add_argument("--features", default=None,
+                        help="Comma-separated subset to compute (dependencies are computed, not saved)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record stage spans (wall/CPU time, peak RSS) to artifacts/spans/features.json")
+    args = parser.parse_args()
+    if args.profile:
+        enable_spans()
+    n_workers = args.workers or available_cores()
+    with span("features"):
+        _run(args, n_workers)
+    if args.profile:
+        save_spans(PROJECT_ROOT / "artifacts" / "spans" / "features.json")
+
+
+def _run(args, n_workers: int):
+    if args.incremental is not None:
+        print(f"Loading new rows from {args.incremental}...")
+        with span("ingestion"):
+            new_rows = load_data(args.incremental)
+        print("Updating features from saved rolling state...")
+        with span("update_features"):
+            updated_rows, state = update_features(new_rows, load_state())
+        with span("save"):
+            save_incremental(updated_rows)
+            save_state(state)
+        print("Done.")
+        return
+
     print("Loading raw data...")
-    crypto_prices = load_data()
-    print("Checking/ensuring datetime columns (no rework if already done)...")
-    crypto_prices = ensure_datetime(crypto_prices)
+    with span("ingestion"):
+        crypto_prices = load_data()
+        print("Checking/ensuring datetime columns (no rework if already done)...")
+        crypto_prices = ensure_datetime(crypto_prices)
 
     print("Running feature engineering...")
-    crypto_prices = feature_engineer(crypto_prices)
+    spec = FeatureSpec(build_features(args.vol_windows, args.ma_windows, args.atr_windows),
+                       select=args.features.split(",") if args.features else None)
+    with span("feature_engineer", workers=n_workers):
+        crypto_prices = feature_engineer(crypto_prices, n_workers=n_workers, spec=spec)
 
     print("Saving processed outputs...")
-    save_processed(crypto_prices)
+    with span("save"):
+        save_processed(crypto_prices, spec)
+        save_state(build_state(crypto_prices, spec))
     print("Done.")
 
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+"""
+Incremental Model Updates
+-------------------------
+Refreshes the registry's current model with the rows that arrived since it
+was trained, instead of retraining everything:
+
+* XGBoost keeps boosting: ``xgb_rounds`` more trees fitted on the new rows
+  only, starting from the current booster.
+* RandomForest / ExtraTrees grow ``forest_trees`` more trees (``warm_start``)
+  on the last ``window_days`` of data; ``max_trees`` drops the oldest trees so
+  the forest does not grow without bound.
+
+The preprocessor fitted by the last full training stays frozen. The newest
+``holdout_days`` dates are held out: the update is published only if it
+scores no worse than the current model there (``tolerance`` on ``metric``).
+Held-out rows are trained on by the next update.
+
+A full ``run_training`` is due instead when ``refit_every`` updates have
+been made since the last full fit, after ``refit_days`` days, or when too
+many new rows belong to cryptos the preprocessor has never seen.
+"""
+
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.components.feature_store import FeatureStore
+from src.components.model_compiler import compile_pipeline
+from src.components.model_store import ModelStore
+from src.components.model_trainer import ModelTrainer
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+from src.utils.metrics import span
+
+logger = get_logger(__name__)
+
+LOWER_IS_BETTER = {"rmse", "mae"}
+
+
+def full_refit_reason(manifest: dict, new_df: pd.DataFrame, refit_every: int = 30, refit_days: float = 90,
+                      max_unseen_frac: float = 0.05) -> Optional[str]:
+    """Why the current model needs a full retrain rather than an update, or None."""
+    updates = manifest.get("updates_since_full", 0)
+    if updates >= refit_every:
+        return f"{updates} incremental updates since the last full refit"
+    last_full = manifest.get("last_full_refit", manifest["created"])
+    if time.time() - last_full > refit_days * 86400:
+        return f"last full refit more than {refit_days:g} days ago"
+    known = set(manifest.get("known_cryptos", []))
+    if known and "crypto_name" in new_df.columns and len(new_df):
+        unseen = float((~new_df["crypto_name"].astype(str).isin(known)).mean())
+        if unseen > max_unseen_frac:
+            return f"{unseen:.0%} of new rows are cryptos the preprocessor has not seen"
+    return None
+
+
+def update_model(pipeline, X_new, y_new, X_window, y_window, xgb_rounds: int = 20, forest_trees: int = 10,
+                 max_trees: Optional[int] = None):
+    """Extend the fitted model in ``pipeline`` in place and return the model's kind."""
+    preprocessor = pipeline.named_steps.get("preprocessor")
+    model = pipeline.named_steps["model"]
+
+    if hasattr(model, "get_booster"):
+        # A new estimator with the same settings, boosting on from the current trees
+        params = {**model.get_params(), "n_estimators": xgb_rounds, "early_stopping_rounds": None}
+        updated = type(model)(**params)
+        updated.fit(preprocessor.transform(X_new), y_new, xgb_model=model.get_booster())
+        pipeline.steps[-1] = ("model", updated)
+        return "boosted"
+
+    if hasattr(model, "estimators_") and "warm_start" in model.get_params():
+        if max_trees is not None and len(model.estimators_) + forest_trees > max_trees:
+            # Sliding forest: the oldest trees make room for the new ones
+            drop = len(model.estimators_) + forest_trees - max_trees
+            model.estimators_ = model.estimators_[drop:]
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + forest_trees)
+        model.fit(preprocessor.transform(X_window), y_window)
+        model.set_params(warm_start=False)
+        return "forest"
+
+    raise CustomException(f"{type(model).__name__} cannot be updated incrementally; run a full training")
+
+
+def run_incremental(artifacts_dir="artifacts", xgb_rounds: int = 20, forest_trees: int = 10,
+                    window_days: int = 90, max_trees: Optional[int] = None, holdout_days: int = 1,
+                    metric: str = "r2", tolerance: float = 0.0, min_new_rows: int = 1,
+                    refit_every: int = 30, refit_days: float = 90, max_unseen_frac: float = 0.05,
+                    full_refit: bool = True) -> dict:
+    """
+    Update the current model with new feature-store rows and publish it if it holds up.
+
+    Returns {"status": "published" | "rejected" | "skipped" | "full_refit", ...}.
+    """
+    print("🔹 Incremental update started...")
+    start_time = time.perf_counter()
+    store = ModelStore(artifacts_dir=artifacts_dir)
+    version = store.current_version()
+    if version is None:
+        raise CustomException("No current model to update; run the training pipeline first")
+    manifest = store.manifest(version)
+    if "end" not in manifest.get("data_range", {}):
+        raise CustomException("Current model has no training data range; run the training pipeline first",
+                              errors={"version": version})
+    trained_end = pd.Timestamp(manifest["data_range"]["end"])
+    target_col = manifest.get("target", "vol_7d_target_next")
+
+    features = FeatureStore(artifacts_dir=artifacts_dir)
+    with span("incremental.read"):
+        df = features.read(model_ready=True, start=str(trained_end - pd.Timedelta(days=window_days)))
+    new_df = df[df["date"] > trained_end]
+
+    reason = full_refit_reason(manifest, new_df, refit_every=refit_every, refit_days=refit_days,
+                               max_unseen_frac=max_unseen_frac)
+    if reason is not None:
+        print(f"⚠️ Full refit due: {reason}")
+        if not full_refit:
+            return {"status": "skipped", "reason": reason, "version": version}
+        from src.pipeline.training_pipeline import run_training
+        candidates = [manifest["candidate"]] if manifest.get("candidate") else None
+        run_training(artifacts_dir=artifacts_dir, candidates=candidates)
+        return {"status": "full_refit", "reason": reason, "version": store.current_version()}
+
+    # The newest dates judge the update; everything before them trains it
+    new_dates = np.sort(new_df["date"].unique())
+    if len(new_dates) <= holdout_days:
+        print(f"⚠️ Only {len(new_dates)} new dates; need more than the {holdout_days} held out")
+        return {"status": "skipped", "reason": "not enough new data", "version": version}
+    cutoff = new_dates[-holdout_days]
+    train_new = new_df[new_df["date"] < cutoff]
+    holdout = new_df[new_df["date"] >= cutoff]
+    window = df[df["date"] < cutoff]
+    if len(train_new) < min_new_rows:
+        return {"status": "skipped", "reason": f"{len(train_new)} new rows < {min_new_rows}", "version": version}
+
+    feature_columns = manifest["feature_columns"]
+    trainer = ModelTrainer(artifacts_dir=artifacts_dir)
+    # Private copies: the update mutates the model in place
+    current = store.load_pipeline(version, mmap=False)
+    pipeline = store.load_pipeline(version, mmap=False)
+    with span("incremental.update"):
+        kind = update_model(pipeline, train_new[feature_columns], train_new[target_col],
+                            window[feature_columns], window[target_col], xgb_rounds=xgb_rounds,
+                            forest_trees=forest_trees, max_trees=max_trees)
+
+    X_hold, y_hold = holdout[feature_columns], holdout[target_col]
+    with span("incremental.evaluate"):
+        before = trainer.evaluate(y_hold, current.predict(X_hold))
+        after = trainer.evaluate(y_hold, pipeline.predict(X_hold))
+    if metric in LOWER_IS_BETTER:
+        accepted = after[metric] <= before[metric] + tolerance
+    else:
+        accepted = after[metric] >= before[metric] - tolerance
+    print(f"Holdout {metric}: current {before[metric]:.4f} -> updated {after[metric]:.4f} "
+          f"({len(train_new)} new rows, {len(holdout)} held out)")
+    if not accepted:
+        print(f"❌ Update rejected; still serving {version}")
+        return {"status": "rejected", "version": version, "before": before, "after": after}
+
+    try:
+        compiled = compile_pipeline(pipeline)
+    except CustomException as ce:
+        compiled = None
+        print(f"⚠️ Compiled export skipped: {ce}")
+    data_range = {**manifest["data_range"], "end": str(train_new["date"].max()),
+                  "rows": manifest["data_range"].get("rows", 0) + len(train_new)}
+    new_version = trainer.publish_model(
+        pipeline, metrics=after, feature_columns=feature_columns, data_range=data_range, compiled=compiled,
+        target=target_col, candidate=manifest.get("candidate"), parent=version, update=kind,
+        known_cryptos=manifest.get("known_cryptos", []),
+        updates_since_full=manifest.get("updates_since_full", 0) + 1,
+        last_full_refit=manifest.get("last_full_refit", manifest["created"]))
+    print(f"✅ Published model version {new_version} (from {version}) "
+          f"in {time.perf_counter() - start_time:.1f}s")
+    return {"status": "published", "version": new_version, "parent": version, "before": before, "after": after}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the current model with new rows instead of retraining.")
+    parser.add_argument("--xgb-rounds", type=int, default=20, help="Boosting rounds added on the new rows")
+    parser.add_argument("--forest-trees", type=int, default=10, help="Trees added to a RandomForest/ExtraTrees")
+    parser.add_argument("--window-days", type=int, default=90, help="Recent days the new forest trees see")
+    parser.add_argument("--max-trees", type=int, default=None, help="Drop the oldest forest trees beyond this")
+    parser.add_argument("--holdout-days", type=int, default=1, help="Newest dates used to accept/reject")
+    parser.add_argument("--metric", default="r2", choices=["r2", "rmse", "mae"])
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Allowed holdout metric loss")
+    parser.add_argument("--refit-every", type=int, default=30, help="Updates between scheduled full refits")
+    parser.add_argument("--refit-days", type=float, default=90, help="Days between scheduled full refits")
+    parser.add_argument("--no-full-refit", action="store_true", help="Only report when a full refit is due")
+    args = parser.parse_args()
+    result = run_incremental(xgb_rounds=args.xgb_rounds, forest_trees=args.forest_trees,
+                             window_days=args.window_days, max_trees=args.max_trees,
+                             holdout_days=args.holdout_days, metric=args.metric, tolerance=args.tolerance,
+                             refit_every=args.refit_every, refit_days=args.refit_days,
+                             full_refit=not args.no_full_refit)
+    print("Result:", result["status"], result.get("version"))
@@ -0,0 +1,198 @@
+"""Background prediction jobs for large uploads.
+
+``JobQueue.submit`` records a job and hands it to a local process pool, so the
+HTTP request returns a job id immediately and its latency no longer depends on
+the file size. Each pool process keeps its own ``ModelRegistry`` and scores
+the upload with ``PredictionPipeline.predict_csv``; results go through the
+``PredictionCache`` like synchronous /predict results, so an identical earlier
+upload finishes at once.
+
+Job state lives in small JSON files (artifacts/jobs/<id>.json), written
+atomically by whichever process owns the job at the time. Any web worker
+process can therefore answer status requests, not just the one that queued it.
+"""
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.pipeline.model_registry import ModelRegistry
+from src.pipeline.prediction_cache import PredictionCache, prune_directory
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter, Gauge
+
+logger = get_logger(__name__)
+
+JOBS_SUBMITTED = Counter("prediction_jobs_total", "Prediction jobs, by final status.")
+JOBS_PENDING = Gauge("prediction_jobs_pending", "Jobs queued or running in this web worker's pool.")
+
+# Per pool process: one warm model per artifacts dir
+_registries = {}
+
+
+def _write_status(path: Path, status: dict):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(status))
+    os.replace(tmp, path)
+
+
+def _run_job(status_path: str, upload_path: str, content_hash: str, max_rows: Optional[int],
+             artifacts_dir: str, cache_dir: str, chunksize: int) -> dict:
+    """Pool worker: score one upload and keep its status file current."""
+    status_path = Path(status_path)
+    status = json.loads(status_path.read_text())
+    status.update(status="running", started=time.time())
+    _write_status(status_path, status)
+    try:
+        if artifacts_dir not in _registries:
+            _registries[artifacts_dir] = ModelRegistry(artifacts_dir=artifacts_dir)
+        predictor = _registries[artifacts_dir].get()
+        cache = PredictionCache(cache_dir, max_bytes=None, max_age=None)
+        key = cache.make_key(content_hash, predictor.model_version, max_rows)
+        status["model_version"] = predictor.model_version
+
+        cached = cache.get(key)
+        if cached is not None:
+            n_rows = cached[0]
+        else:
+            last_write = [0.0]
+
+            def progress(rows_done: int):
+                # Rewrite the status file at most twice a second
+                if time.monotonic() - last_write[0] >= 0.5:
+                    status["rows_done"] = rows_done
+                    _write_status(status_path, status)
+                    last_write[0] = time.monotonic()
+
+            tmp_path = cache.tmp_path(key)
+            n_rows, sample_df = predictor.predict_csv(upload_path, tmp_path, chunksize=chunksize,
+                                                      max_rows=max_rows, progress=progress)
+            cache.put(key, tmp_path, n_rows, sample_df, predictor.model_version)
+        status.update(status="done", rows_done=n_rows, n_rows=n_rows, finished=time.time(),
+                      download_file=cache.output_path(key).name)
+    except Exception as e:
+        logger.error(f"Job {status['job_id']} failed: {e}")
+        status.update(status="failed", error=str(e), finished=time.time())
+    _write_status(status_path, status)
+    return status
+
+
+class JobQueue:
+    def __init__(self, artifacts_dir: str = "artifacts", cache_dir: Optional[str] = None,
+                 n_workers: int = 2, max_pending: int = 16, chunksize: int = 50_000,
+                 status_max_age: float = 7 * 86400):
+        self.artifacts_dir = Path(artifacts_dir)
+        self.jobs_dir = self.artifacts_dir / "jobs"
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else self.artifacts_dir / "predictions"
+        self.n_workers = n_workers
+        self.max_pending = max_pending
+        self.chunksize = chunksize
+        self.status_max_age = status_max_age
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._pending = 0
+        # Upload path -> jobs of this process still to read it; uploads pruning must keep these
+        self._uploads: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Pools do not survive fork(); spawn keeps the web server's threads out of the workers
+        if self._pid != os.getpid():
+            # Forked copy of a queue: the parent's jobs are not ours to count
+            self._pool, self._pid, self._pending, self._uploads = None, os.getpid(), 0, {}
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.n_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _status_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def submit(self, upload_path: str, content_hash: str, max_rows: Optional[int] = None) -> str:
+        """Queue a prediction job and return its id; raises CustomException when the queue is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise CustomException("Prediction queue is full, try again later",
+                                      errors={"max_pending": self.max_pending})
+            pool = self._executor()
+            self._pending += 1
+            self._uploads[str(upload_path)] = self._uploads.get(str(upload_path), 0) + 1
+            JOBS_PENDING.set(self._pending)
+
+        job_id = uuid.uuid4().hex
+        status_path = self._status_path(job_id)
+        _write_status(status_path, {"job_id": job_id, "status": "queued", "submitted": time.time(),
+                                    "rows_done": 0, "max_rows": max_rows})
+        args = (_run_job, str(status_path), str(upload_path), content_hash, max_rows,
+                str(self.artifacts_dir), str(self.cache_dir), self.chunksize)
+        try:
+            try:
+                future = pool.submit(*args)
+            except BrokenProcessPool:
+                # A worker died earlier; start a fresh pool once
+                with self._lock:
+                    self._pool = None
+                    pool = self._executor()
+                future = pool.submit(*args)
+        except Exception:
+            self._finished(status_path, str(upload_path), None)
+            status_path.unlink(missing_ok=True)
+            raise
+        future.add_done_callback(functools.partial(self._finished, status_path, str(upload_path)))
+        logger.info(f"Queued job {job_id} for {upload_path}")
+        # Finished jobs' status files are kept as long as cached predictions
+        prune_directory(self.jobs_dir, max_age=self.status_max_age, pattern="*.json")
+        return job_id
+
+    def _finished(self, status_path: Path, upload_path: str, future: Optional[Future]):
+        with self._lock:
+            self._pending = max(0, self._pending - 1)
+            left = self._uploads.pop(upload_path, 1) - 1
+            if left > 0:
+                self._uploads[upload_path] = left
+            JOBS_PENDING.set(self._pending)
+        if future is None:
+            return
+        if future.exception() is not None:
+            # The worker process died (e.g. killed for memory); the job never wrote its final status
+            status = json.loads(status_path.read_text())
+            status.update(status="failed", error=f"Worker failed: {future.exception()}", finished=time.time())
+            _write_status(status_path, status)
+            JOBS_SUBMITTED.inc(status="failed")
+        else:
+            JOBS_SUBMITTED.inc(status=future.result()["status"])
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """Current job status, or None for an unknown id."""
+        # Job ids are uuid4 hex; anything else never names a file
+        if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            return json.loads(self._status_path(job_id).read_text())
+        except FileNotFoundError:
+            return None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def pending_uploads(self) -> set:
+        """Upload files that queued or running jobs of this process have yet to finish reading."""
+        with self._lock:
+            return set(self._uploads)
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=wait)
+            self._pool = None
@@ -0,0 +1,154 @@
+"""Server-side micro-batching for small prediction requests.
+
+Concurrent callers submit small DataFrames; a background thread waits at most
+``max_wait_ms`` (or until ``max_batch_rows`` rows are queued), runs a single
+vectorized ``predict`` over the concatenated rows and hands every caller back
+only its own slice. Requests are only concatenated with others that have the
+same columns.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from src.pipeline.prediction_pipeline import PredictionPipeline
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher:
+    def __init__(self, get_predictor: Callable[[], "PredictionPipeline"],
+                 max_batch_rows: int = 4096, max_wait_ms: float = 5.0):
+        self.get_predictor = get_predictor
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[Tuple[pd.DataFrame, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(): start one lazily in every process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, input_data: "pd.DataFrame") -> Tuple[np.ndarray, str]:
+        """Queue rows for prediction and block until their predictions are ready."""
+        if input_data.empty:
+            raise CustomException("Input data for prediction is empty")
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((input_data, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            rows = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch: List[Tuple["pd.DataFrame", Future]]):
+        try:
+            predictor = self.get_predictor()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        # Only requests with the same columns share a predict: concatenating others would fill
+        # a request's missing features with NaN instead of failing it like a lone request
+        groups: Dict[Tuple[str, ...], List[Tuple["pd.DataFrame", Future]]] = {}
+        for item in batch:
+            groups.setdefault(tuple(item[0].columns), []).append(item)
+        for group in groups.values():
+            self._score_group(predictor, group)
+
+    def _score_group(self, predictor: "PredictionPipeline", batch: List[Tuple["pd.DataFrame", Future]]):
+        try:
+            frames = [df for df, _ in batch]
+            if len(frames) == 1:
+                X = frames[0]
+            else:
+                import pandas as pd
+                X = pd.concat(frames, ignore_index=True)
+            preds = np.asarray(predictor.predict(X))
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One malformed request must not fail the others in its batch
+            logger.warning(f"Batch of {len(batch)} requests failed; retrying them one by one")
+            for df, future in batch:
+                try:
+                    future.set_result((np.asarray(predictor.predict(df)), predictor.model_version))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for df, future in batch:
+            future.set_result((preds[start:start + len(df)], predictor.model_version))
+            start += len(df)
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from src.pipeline.model_registry import ModelRegistry
+    from src.components.feature_store import FeatureStore
+    from src.feature_spec import NON_FEATURE_COLS
+
+    print("🔹 Running micro-batcher test...")
+    registry = ModelRegistry()
+    batcher = MicroBatcher(registry.get, max_wait_ms=5)
+    X = FeatureStore().read(model_ready=True).drop(columns=NON_FEATURE_COLS).head(2000)
+    expected = registry.get().predict(X)
+
+    rows = [X.iloc[[i]] for i in range(len(X))]
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda r: batcher.submit(r)[0][0], rows))
+        batched_time = time.perf_counter() - start
+    assert np.allclose(results, expected), "each caller must get back its own rows"
+
+    start = time.perf_counter()
+    for r in rows[:200]:
+        registry.get().predict(r)
+    single_time = (time.perf_counter() - start) * len(rows) / 200
+    print(f"✅ {len(rows)} single-row calls: batched {batched_time:.2f}s vs one-by-one ~{single_time:.2f}s")
+
+    # A request missing a feature must fail even when batched with a complete one
+    incomplete = X.iloc[[1]].drop(columns=[X.columns[0]])
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        complete_future = pool.submit(batcher.submit, X.iloc[[0]])
+        incomplete_future = pool.submit(batcher.submit, incomplete)
+        assert np.allclose(complete_future.result()[0], expected[:1])
+        assert incomplete_future.exception() is not None, "a missing column must not be imputed by batching"
+    print("✅ Requests with different columns are scored separately")
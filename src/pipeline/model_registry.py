@@ -0,0 +1,113 @@
+"""Process-wide cache of the serving model with hot reload.
+
+The Flask app asks the registry for the current PredictionPipeline on every
+request instead of loading the model each time. When the model store's
+CURRENT pointer moves (or, without a store, best_pipeline.joblib changes on
+disk), the first request that notices loads and warms the new model
+while other requests keep using the old one, then swaps it in; requests that
+already hold the old model finish with it.
+"""
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from src.components.model_store import ModelStore
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter, Gauge
+
+if TYPE_CHECKING:
+    from src.pipeline.prediction_pipeline import PredictionPipeline
+
+logger = get_logger(__name__)
+
+MODEL_LOAD_SECONDS = Gauge("model_load_seconds", "Time to load and warm the serving model, last load.")
+MODEL_LOADS = Counter("model_loads_total", "Serving model loads, by outcome.")
+MODEL_INFO = Gauge("model_info", "Version of the model being served (value is always 1).")
+
+
+class ModelRegistry:
+    def __init__(self, artifacts_dir: str = "artifacts", check_interval: float = 2.0):
+        self.artifacts_dir = Path(artifacts_dir)
+        self.store = ModelStore(artifacts_dir=self.artifacts_dir)
+        self.model_path = self.artifacts_dir / "models" / "best_pipeline.joblib"
+        self.check_interval = check_interval
+
+        self._current: Optional["PredictionPipeline"] = None
+        self._signature = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _stat_signature(self):
+        version = self.store.current_version()
+        if version is not None:
+            return version
+        try:
+            stat = self.model_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature) -> None:
+        """Load, warm up and publish a new model. Caller holds _reload_lock."""
+        # pandas and the model stack load with the first model, not with the app
+        from src.pipeline.prediction_pipeline import PredictionPipeline
+
+        start = time.perf_counter()
+        # Load exactly the version we saw, even if CURRENT moves again meanwhile
+        version = signature if isinstance(signature, str) else None
+        candidate = PredictionPipeline(artifacts_dir=self.artifacts_dir, version=version)
+        if self._current is not None and candidate.model_version == self._current.model_version:
+            # Touched but identical content: keep the warm instance
+            self._signature = signature
+            return
+        candidate.warmup()
+        previous = self._current.model_version if self._current is not None else None
+        # A single reference assignment: readers see either the old or the new model
+        self._current = candidate
+        self._signature = signature
+        seconds = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.set(seconds)
+        MODEL_LOADS.inc(outcome="loaded")
+        MODEL_INFO.clear()
+        MODEL_INFO.set(1, version=candidate.model_version)
+        logger.info(f"Model {candidate.model_version} ready in {seconds:.2f}s (previous: {previous})")
+
+    def get(self) -> "PredictionPipeline":
+        """Return the current model, reloading it first if the artifact changed."""
+        now = time.monotonic()
+        if self._current is not None and now - self._last_check < self.check_interval:
+            return self._current
+
+        signature = self._stat_signature()
+        if self._current is None or signature != self._signature:
+            # Only one thread reloads; the others keep serving the current model
+            blocking = self._current is None
+            if self._reload_lock.acquire(blocking=blocking):
+                try:
+                    if self._current is None or self._stat_signature() != self._signature:
+                        self._load(self._stat_signature())
+                except Exception as e:
+                    MODEL_LOADS.inc(outcome="failed")
+                    if self._current is None:
+                        raise
+                    logger.error(f"Model reload failed, still serving {self._current.model_version}: {e}")
+                finally:
+                    self._last_check = now
+                    self._reload_lock.release()
+        else:
+            self._last_check = now
+        return self._current
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current.model_version if self._current is not None else None
+
+
+if __name__ == "__main__":
+    print("🔹 Running model registry test...")
+    registry = ModelRegistry(check_interval=0)
+    first = registry.get()
+    print("Loaded model version:", first.model_version)
+    assert registry.get() is first, "unchanged artifact must not be reloaded"
+    print("✅ Cached model reused")
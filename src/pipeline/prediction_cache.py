@@ -0,0 +1,175 @@
+"""Content-addressed cache of /predict results with bounded disk usage.
+
+An entry is keyed by the SHA-256 of the uploaded bytes, the model version and
+``max_rows``, so re-uploading the same file against the same model returns the
+stored predictions without scoring again. Each entry is a predictions CSV plus
+a small JSON sidecar (row count and the sample rows shown on the result page).
+
+Entries are evicted least-recently-used first once the directory exceeds
+``max_bytes``, and unconditionally once older than ``max_age`` seconds; a hit
+refreshes the entry's mtime. Files passed as ``keep`` (still being read, or
+just published) are never evicted. ``prune_directory`` applies the same policy to
+plain directories such as uploads/.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+CACHE_REQUESTS = Counter("prediction_cache_requests_total", "Prediction cache lookups, by result.")
+CACHE_EVICTIONS = Counter("prediction_cache_evictions_total", "Files removed by size/age eviction, by directory.")
+
+HASH_BLOCK = 1 << 20
+
+
+def file_sha256(path) -> str:
+    """Hex SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _evict(groups: List[Tuple[float, int, List[Path]]], max_bytes: Optional[int], max_age: Optional[float],
+           label: str, keep: Iterable = ()) -> int:
+    """
+    Delete whole groups: first those older than max_age, then oldest-first until under max_bytes.
+    Groups holding a ``keep`` path are skipped (they still count toward the total).
+    """
+    now = time.time()
+    keep = {Path(p).resolve() for p in keep}
+    total = sum(size for _, size, _ in groups)
+    removed = 0
+    for mtime, size, paths in sorted(groups, key=lambda g: g[0]):
+        expired = max_age is not None and now - mtime > max_age
+        over = max_bytes is not None and total > max_bytes
+        if not (expired or over):
+            continue
+        if keep and any(path.resolve() in keep for path in paths):
+            continue
+        for path in paths:
+            # Already gone (another worker evicted it) is fine; open readers keep their handle on POSIX
+            path.unlink(missing_ok=True)
+        total -= size
+        removed += len(paths)
+    if removed:
+        CACHE_EVICTIONS.inc(removed, directory=label)
+        logger.info(f"Evicted {removed} files from {label} ({total / 2**20:.1f} MB left)")
+    return removed
+
+
+def _stat_files(paths: Iterable[Path]) -> List[Tuple[Path, os.stat_result]]:
+    stats = []
+    for path in paths:
+        try:
+            stats.append((path, path.stat()))
+        except FileNotFoundError:
+            continue
+    return stats
+
+
+def prune_directory(directory, max_bytes: Optional[int] = None, max_age: Optional[float] = None,
+                    pattern: str = "*", keep: Iterable = ()) -> int:
+    """
+    Bound a directory of independent files by total size (LRU by mtime) and age, never removing
+    the ``keep`` paths. Returns files removed.
+    """
+    directory = Path(directory)
+    files = _stat_files(p for p in directory.glob(pattern) if p.is_file() and not p.name.startswith("."))
+    groups = [(st.st_mtime, st.st_size, [path]) for path, st in files]
+    return _evict(groups, max_bytes, max_age, label=directory.name, keep=keep)
+
+
+class PredictionCache:
+    def __init__(self, directory, max_bytes: Optional[int] = 1 << 30, max_age: Optional[float] = 7 * 86400,
+                 prune_interval: float = 60.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content_hash: str, model_version: str, max_rows: Optional[int]) -> str:
+        return hashlib.sha256(f"{content_hash}:{model_version}:{max_rows}".encode()).hexdigest()[:24]
+
+    def output_path(self, key: str) -> Path:
+        return self.directory / f"predictions_{key}.csv"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"predictions_{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[int, "pd.DataFrame"]]:
+        """(n_rows, sample_df) of a stored entry, or None. A hit marks the entry as recently used."""
+        out_path, meta_path = self.output_path(key), self._meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            # Touch both so LRU eviction keeps the pair together
+            os.utime(out_path)
+            os.utime(meta_path)
+        except (FileNotFoundError, ValueError):
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        CACHE_REQUESTS.inc(result="hit")
+        import pandas as pd
+        return meta["n_rows"], pd.DataFrame.from_records(meta["sample"], columns=meta["columns"])
+
+    def put(self, key: str, tmp_output: Path, n_rows: int, sample_df: "pd.DataFrame", model_version: str) -> Path:
+        """Publish a finished predictions file (written to ``tmp_output``) and its sidecar atomically."""
+        out_path, meta_path = self.output_path(key), self._meta_path(key)
+        meta = {"n_rows": int(n_rows), "columns": list(sample_df.columns),
+                "sample": json.loads(sample_df.to_json(orient="records")), "model_version": model_version}
+        tmp_meta = meta_path.with_name(f".{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_meta.write_text(json.dumps(meta))
+        # CSV first: a sidecar only ever points at a complete file
+        os.replace(tmp_output, out_path)
+        os.replace(tmp_meta, meta_path)
+        # The caller is about to link to this entry: eviction must leave it alone
+        self.prune(keep=(out_path, meta_path))
+        return out_path
+
+    def tmp_path(self, key: str) -> Path:
+        """Private path to write a new entry's CSV to before ``put``."""
+        return self.directory / f".predictions_{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def prune(self, force: bool = False, keep: Iterable = ()) -> int:
+        """
+        Apply size/age eviction, at most once per ``prune_interval`` seconds unless forced.
+        Entries with a file in ``keep`` stay.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_prune < self.prune_interval:
+            return 0
+        if not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_prune = now
+            entries = {}
+            for path, st in _stat_files(self.directory.glob("predictions_*")):
+                entry = entries.setdefault(path.stem, [0.0, 0, []])
+                entry[0] = max(entry[0], st.st_mtime)
+                entry[1] += st.st_size
+                entry[2].append(path)
+            removed = _evict([tuple(e) for e in entries.values()], self.max_bytes, self.max_age,
+                             label=self.directory.name, keep=keep)
+            # Leftovers of interrupted writes
+            for path, st in _stat_files(self.directory.glob(".predictions_*.tmp")):
+                if time.time() - st.st_mtime > 3600:
+                    path.unlink(missing_ok=True)
+            return removed
+        finally:
+            self._prune_lock.release()
@@ -0,0 +1,446 @@
+"""
+Streaming Pipeline
+------------------
+Live volatility forecasts from a tick stream::
+
+    tick source --(bounded queue)--> bars -> online features -> model --(bounded queue)--> publisher
+
+* A reader thread pulls tick chunks from a source (see tick_sources.py).
+* The processing thread aggregates them into OHLCV bars of ``interval``
+  seconds per asset, aligned to the epoch, so daily bars are UTC days like the
+  batch data. An interval closes for every asset at once: when the first tick
+  of a later interval arrives or, with ``wall_clock``, ``close_delay`` seconds
+  after its end.
+* The bars of a closing interval go through ``OnlineFeatures.update`` and one
+  vectorized predict of the registry's current model, hot-reloaded like in
+  the Flask app. The compiled export scores intervals of up to a few hundred
+  assets, and the sklearn pipeline scores larger ones.
+* A publisher thread writes the forecasts (JSON lines by default).
+
+Backpressure: with ``policy="block"`` (default) a full tick queue stops the
+reader. The file tail then stops reading and socket producers are throttled
+by TCP, so nothing is lost. With ``"drop"``, chunks that do not fit are
+dropped and counted, keeping forecasts fresh at the cost of completeness. A
+full forecast queue drops its oldest batch, so a slow consumer gets the latest
+forecasts rather than a growing backlog.
+
+Latency is exported as the ``stream_bar_to_forecast_seconds`` and
+``stream_bar_to_publish_seconds`` histograms (``--metrics-port`` serves them).
+"""
+
+import argparse
+import importlib
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.components.online_features import AssetIndex, OnlineFeatures
+from src.feature_spec import FeatureSpec
+from src.pipeline.tick_sources import TickSource, Ticks, make_source
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter, Gauge, Histogram
+
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+STREAM_TICKS = Counter("stream_ticks_total", "Ticks consumed by the streaming pipeline, by outcome.")
+STREAM_BARS = Counter("stream_bars_total", "Bars closed by the streaming pipeline.")
+STREAM_FORECASTS = Counter("stream_forecasts_total", "Streaming forecasts, by outcome.")
+BAR_TO_FORECAST = Histogram("stream_bar_to_forecast_seconds", "Interval close to forecast ready, per interval.",
+                            buckets=LATENCY_BUCKETS)
+BAR_TO_PUBLISH = Histogram("stream_bar_to_publish_seconds", "Interval close to forecast published, per interval.",
+                           buckets=LATENCY_BUCKETS)
+QUEUE_DEPTH = Gauge("stream_queue_depth", "Items waiting in the streaming pipeline's queues.")
+
+BAR_COLUMNS = ["open", "high", "low", "close", "volume", "marketCap"]
+_EOF = object()
+
+
+class BarAggregator:
+    """
+    OHLCV bars of ``interval`` seconds for every asset of ``index``.
+
+    ``volume`` is the traded notional (price x size), like the USD volume of
+    the daily data. ``marketCap`` is the last one reported, carried forward.
+    Ticks of an interval that already closed are late and dropped.
+    """
+
+    def __init__(self, index: AssetIndex, interval: float = 86400.0, capacity: int = 1024):
+        self.index = index
+        self.interval = float(interval)
+        self.bucket: Optional[int] = None
+        self.capacity = 0
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._grow(max(1, capacity))
+
+    def _grow(self, capacity: int):
+        fills = {"open": np.nan, "high": -np.inf, "low": np.inf, "close": np.nan, "volume": 0.0,
+                 "marketCap": np.nan, "active": False}
+        for name, fill in fills.items():
+            array = np.full(capacity, fill, dtype=bool if name == "active" else np.float64)
+            if name in self._arrays:
+                array[:self.capacity] = self._arrays[name]
+            self._arrays[name] = array
+        self.capacity = capacity
+
+    def add(self, ticks: Ticks) -> List[dict]:
+        """Aggregate a chunk of ticks; returns the bars of every interval it closed."""
+        price = ticks["price"]
+        valid = np.isfinite(price) & (price > 0) & np.isfinite(ticks["timestamp"])
+        if not valid.all():
+            STREAM_TICKS.inc(int((~valid).sum()), outcome="invalid")
+        bucket = np.floor(ticks["timestamp"][valid] / self.interval).astype(np.int64)
+        if self.bucket is not None:
+            late = bucket < self.bucket
+            if late.any():
+                STREAM_TICKS.inc(int(late.sum()), outcome="late")
+                valid[np.flatnonzero(valid)[late]] = False
+                bucket = bucket[~late]
+        if not valid.any():
+            return []
+        rows = self.index.lookup(ticks["crypto_name"][valid])
+        if len(self.index) > self.capacity:
+            self._grow(max(len(self.index), 2 * self.capacity))
+        price, size, mcap = (ticks[c][valid] for c in ("price", "size", "marketCap"))
+        STREAM_TICKS.inc(len(rows), outcome="accepted")
+
+        closed = []
+        # Usually one interval per chunk; ticks keep their arrival order within an interval
+        order = np.argsort(bucket, kind="stable")
+        bounds = np.r_[0, np.flatnonzero(np.diff(bucket[order])) + 1, len(order)]
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            sel = order[lo:hi]
+            b = int(bucket[sel[0]])
+            if self.bucket is None:
+                self.bucket = b
+            elif b > self.bucket:
+                bars = self._close()
+                if bars is not None:
+                    closed.append(bars)
+                self.bucket = b
+            self._update(rows[sel], price[sel], size[sel], mcap[sel])
+        return closed
+
+    def _update(self, rows: np.ndarray, price: np.ndarray, size: np.ndarray, mcap: np.ndarray):
+        a = self._arrays
+        assets, first = np.unique(rows, return_index=True)
+        new = ~a["active"][assets]
+        a["open"][assets[new]] = price[first[new]]
+        a["high"][assets[new]], a["low"][assets[new]], a["volume"][assets[new]] = -np.inf, np.inf, 0.0
+        a["active"][assets] = True
+        np.maximum.at(a["high"], rows, price)
+        np.minimum.at(a["low"], rows, price)
+        np.add.at(a["volume"], rows, price * size)
+        # Last tick per asset: first occurrence in the reversed chunk
+        last = len(rows) - 1 - np.unique(rows[::-1], return_index=True)[1]
+        a["close"][assets] = price[last]
+        reported = np.flatnonzero(np.isfinite(mcap))
+        if len(reported):
+            assets_r, last_r = np.unique(rows[reported][::-1], return_index=True)
+            a["marketCap"][assets_r] = mcap[reported][len(reported) - 1 - last_r]
+
+    def _close(self) -> Optional[dict]:
+        """Bars of every asset that traded in the current interval, which is reset."""
+        a = self._arrays
+        rows = np.flatnonzero(a["active"])
+        if len(rows) == 0:
+            return None
+        a["active"][rows] = False
+        STREAM_BARS.inc(len(rows))
+        start = self.bucket * self.interval
+        names = np.asarray(self.index.names, dtype=object)[rows]
+        return {"rows": rows, "crypto_name": names, "start": start, "end": start + self.interval,
+                "closed_at": time.perf_counter(), **{c: a[c][rows].copy() for c in BAR_COLUMNS}}
+
+    def advance(self, now: float) -> List[dict]:
+        """Close the current interval if ``now`` (epoch seconds) is past its end."""
+        if self.bucket is None or now < (self.bucket + 1) * self.interval:
+            return []
+        bars = self._close()
+        self.bucket = int(np.floor(now / self.interval))
+        return [bars] if bars is not None else []
+
+    def flush(self) -> List[dict]:
+        """Close the current interval whatever the time (end of stream)."""
+        bars = self._close() if self.bucket is not None else None
+        return [bars] if bars is not None else []
+
+
+class JsonLinesPublisher:
+    """Writes one JSON object per forecast to a file (``-`` = stdout)."""
+
+    def __init__(self, path: str = "-"):
+        self._out = sys.stdout if path == "-" else open(path, "a", buffering=1 << 16)
+
+    def __call__(self, forecasts: dict):
+        end = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(forecasts["bar_end"]))
+        version = forecasts["model_version"]
+        lines = [json.dumps({"crypto_name": name, "bar_end": end, "forecast": float(pred), "warm": bool(warm),
+                             "model_version": version})
+                 for name, pred, warm in zip(forecasts["crypto_name"], forecasts["prediction"], forecasts["warm"])]
+        self._out.write("\n".join(lines) + "\n")
+        self._out.flush()
+
+    def close(self):
+        if self._out is not sys.stdout:
+            self._out.close()
+
+
+def _model_inputs(predictor, columns: Dict[str, np.ndarray], n: int):
+    """What the predictor scores: a column mapping for the compiled model, else a DataFrame."""
+    if predictor.uses_compiled(n):
+        return {c: columns.get(c, np.full(n, np.nan)) for c in predictor.compiled.feature_names}
+    import pandas as pd
+
+    names = (predictor.manifest or {}).get("feature_columns")
+    if names is None:
+        names = list(getattr(predictor.pipeline, "feature_names_in_", columns))
+    return pd.DataFrame({c: columns.get(c, np.full(n, np.nan)) for c in names})
+
+
+class StreamingPipeline:
+    def __init__(self, source: TickSource, publish: Callable[[dict], None], artifacts_dir: str = "artifacts",
+                 interval: float = 86400.0, spec: Optional[FeatureSpec] = None, registry=None,
+                 policy: str = "block", max_queued_chunks: int = 64, max_queued_forecasts: int = 64,
+                 chunk_size: int = 10_000, wall_clock: bool = False, close_delay: float = 5.0):
+        if policy not in ("block", "drop"):
+            raise CustomException(f"Unknown backpressure policy: {policy}", errors={"available": ["block", "drop"]})
+        if registry is None:
+            from src.pipeline.model_registry import ModelRegistry
+            registry = ModelRegistry(artifacts_dir=artifacts_dir)
+        self.source = source
+        self.publish = publish
+        self.registry = registry
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.wall_clock = wall_clock
+        self.close_delay = close_delay
+
+        self.index = AssetIndex()
+        self.bars = BarAggregator(self.index, interval=interval)
+        self.features = OnlineFeatures(spec, self.index)
+        # Bars an asset needs before its windows are as full as in the batch features
+        self.warm_bars = max(1, self.features.spec.state_rows - 1)
+
+        self._ticks: "queue.Queue" = queue.Queue(maxsize=max_queued_chunks)
+        self._forecasts: "queue.Queue" = queue.Queue(maxsize=max_queued_forecasts)
+        self._stop = threading.Event()
+        self.latencies: deque = deque(maxlen=10_000)
+        self.stats = {"ticks": 0, "bars": 0, "forecasts": 0, "dropped_ticks": 0, "dropped_forecasts": 0,
+                      "failed": 0}
+
+    def warm_start(self, history) -> int:
+        """Replay past daily bars (e.g. the saved feature state) so windows start full; returns the bars fed."""
+        return self.features.replay(history)
+
+    def score(self, bars: dict) -> dict:
+        """Online features and predictions for the bars of one closed interval."""
+        rows = bars["rows"]
+        columns = {**{c: bars[c] for c in BAR_COLUMNS}, **self.features.update(rows, bars),
+                   "crypto_name": bars["crypto_name"]}
+        predictor = self.registry.get()
+        inputs = _model_inputs(predictor, columns, len(rows))
+        prediction = np.asarray(predictor.compiled.predict(inputs) if predictor.uses_compiled(len(rows))
+                                else predictor.predict(inputs), dtype=np.float64)
+        return {"crypto_name": bars["crypto_name"], "bar_start": bars["start"], "bar_end": bars["end"],
+                "prediction": prediction, "warm": self.features.bars_seen[rows] >= self.warm_bars,
+                "model_version": predictor.model_version, "closed_at": bars["closed_at"]}
+
+    def _forecast(self, bars: dict):
+        try:
+            forecasts = self.score(bars)
+        except Exception as e:
+            self.stats["failed"] += len(bars["rows"])
+            STREAM_FORECASTS.inc(len(bars["rows"]), outcome="failed")
+            logger.error(f"Scoring {len(bars['rows'])} bars failed: {e}")
+            return
+        latency = time.perf_counter() - bars["closed_at"]
+        BAR_TO_FORECAST.observe(latency)
+        self.latencies.append(latency)
+        self.stats["bars"] += len(bars["rows"])
+        try:
+            self._forecasts.put_nowait(forecasts)
+        except queue.Full:
+            # Slow consumer: the oldest batch makes room for the newest
+            try:
+                stale = self._forecasts.get_nowait()
+                self.stats["dropped_forecasts"] += len(stale["prediction"])
+                STREAM_FORECASTS.inc(len(stale["prediction"]), outcome="dropped")
+            except queue.Empty:
+                pass
+            self._forecasts.put_nowait(forecasts)
+        QUEUE_DEPTH.set(self._forecasts.qsize(), queue="forecasts")
+
+    def _read_loop(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self.source.read(self.chunk_size, timeout=0.1)
+                if chunk is None:
+                    break
+                n = len(chunk["price"])
+                if n == 0:
+                    continue
+                self.stats["ticks"] += n
+                if self.policy == "drop":
+                    try:
+                        self._ticks.put_nowait(chunk)
+                    except queue.Full:
+                        self.stats["dropped_ticks"] += n
+                        STREAM_TICKS.inc(n, outcome="dropped")
+                    continue
+                # Block (in short waits, to notice stop()) until the processor catches up
+                while not self._stop.is_set():
+                    try:
+                        self._ticks.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                QUEUE_DEPTH.set(self._ticks.qsize(), queue="ticks")
+        except Exception as e:
+            logger.error(f"Tick source failed: {e}")
+        finally:
+            self._ticks.put(_EOF)
+
+    def _publish_loop(self):
+        while True:
+            forecasts = self._forecasts.get()
+            if forecasts is _EOF:
+                return
+            try:
+                self.publish(forecasts)
+            except Exception as e:
+                STREAM_FORECASTS.inc(len(forecasts["prediction"]), outcome="publish_failed")
+                logger.error(f"Publishing {len(forecasts['prediction'])} forecasts failed: {e}")
+                continue
+            BAR_TO_PUBLISH.observe(time.perf_counter() - forecasts["closed_at"])
+            STREAM_FORECASTS.inc(len(forecasts["prediction"]), outcome="published")
+            self.stats["forecasts"] += len(forecasts["prediction"])
+
+    def run(self, max_seconds: Optional[float] = None) -> dict:
+        """Consume the source until it ends, ``stop()`` is called or ``max_seconds`` pass; returns stats."""
+        self.registry.get()  # load the model before the first bar closes
+        # The DataFrame path (no compiled export, or more assets than it scores) needs pandas:
+        # import it now rather than on the first closed interval
+        importlib.import_module("pandas")
+        reader = threading.Thread(target=self._read_loop, name="stream-reader", daemon=True)
+        publisher = threading.Thread(target=self._publish_loop, name="stream-publisher", daemon=True)
+        reader.start()
+        publisher.start()
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        try:
+            while not self._stop.is_set():
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                try:
+                    item = self._ticks.get(timeout=0.1)
+                except queue.Empty:
+                    item = None
+                if item is _EOF:
+                    # End of stream: the last interval is complete
+                    for bars in self.bars.flush():
+                        self._forecast(bars)
+                    break
+                closed = self.bars.add(item) if item is not None else []
+                if self.wall_clock:
+                    closed += self.bars.advance(time.time() - self.close_delay)
+                for bars in closed:
+                    self._forecast(bars)
+        finally:
+            self._stop.set()
+            self._forecasts.put(_EOF)
+            publisher.join()
+            reader.join(timeout=1.0)
+            self.source.close()
+        return self.summary()
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self) -> dict:
+        latencies = np.asarray(self.latencies) * 1000
+        percentiles = {}
+        if len(latencies):
+            percentiles = {f"p{q}_ms": float(np.percentile(latencies, q)) for q in (50, 99)}
+        return {**self.stats, **percentiles}
+
+
+def _serve_metrics(port: int):
+    """Expose this process's metrics at http://0.0.0.0:<port>/metrics."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from src.utils.metrics import PROMETHEUS_CONTENT_TYPE, render
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="stream-metrics", daemon=True).start()
+    logger.info(f"Metrics on http://0.0.0.0:{port}/metrics")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast volatility live from a tick stream.")
+    parser.add_argument("--source", default="file", help="Tick source (see tick_sources.SOURCES)")
+    parser.add_argument("--path", default="data/ticks.csv", help="Tick file for --source file")
+    parser.add_argument("--no-follow", action="store_true", help="Replay the tick file and stop at its end")
+    parser.add_argument("--host", default="127.0.0.1", help="Listen address for --source socket")
+    parser.add_argument("--port", type=int, default=9009, help="Listen port for --source socket")
+    parser.add_argument("--interval", type=float, default=86400.0, help="Bar length in seconds")
+    parser.add_argument("--wall-clock", action="store_true",
+                        help="Also close bars by the wall clock, --close-delay seconds after they end")
+    parser.add_argument("--close-delay", type=float, default=5.0)
+    parser.add_argument("--policy", default="block", choices=["block", "drop"], help="When the tick queue is full")
+    parser.add_argument("--out", default="-", help="JSON-lines forecast file (- = stdout)")
+    parser.add_argument("--no-warm-start", action="store_true", help="Do not replay the saved feature state")
+    parser.add_argument("--metrics-port", type=int, default=None)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.source == "file":
+        source = make_source("file", path=args.path, follow=not args.no_follow)
+    elif args.source == "socket":
+        source = make_source("socket", host=args.host, port=args.port)
+    else:
+        source = make_source(args.source)
+
+    spec, history = None, None
+    if not args.no_warm_start:
+        from src.features import load_state, state_spec
+        try:
+            history = load_state()
+            spec = state_spec(history)
+        except FileNotFoundError as e:
+            print(f"⚠️ No warm start: {e}", file=sys.stderr)
+    if args.metrics_port:
+        _serve_metrics(args.metrics_port)
+
+    publisher = JsonLinesPublisher(args.out)
+    pipeline = StreamingPipeline(source, publisher, interval=args.interval, spec=spec, policy=args.policy,
+                                 wall_clock=args.wall_clock, close_delay=args.close_delay)
+    if history is not None:
+        print(f"🔹 Warm start: replayed {pipeline.warm_start(history)} bars", file=sys.stderr)
+    print("🔹 Streaming forecasts... (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        summary = pipeline.run(max_seconds=args.max_seconds)
+    except KeyboardInterrupt:
+        pipeline.stop()
+        summary = pipeline.summary()
+    finally:
+        publisher.close()
+    print("✅ Stream finished:", summary, file=sys.stderr)
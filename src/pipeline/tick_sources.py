@@ -0,0 +1,313 @@
+"""Pluggable tick sources for the streaming pipeline.
+
+A source hands out ticks in chunks: ``read(max_ticks, timeout)`` returns a
+``Ticks`` mapping of equal-length arrays (``timestamp`` in epoch seconds,
+``crypto_name``, ``price``, ``size``, ``marketCap``), an empty one when nothing
+arrived within ``timeout``, or None once the source is exhausted.
+
+Ticks are text lines, either CSV with a header naming the columns or one JSON
+object per line:
+
+    timestamp,crypto_name,price,size,marketCap
+    1700000000.25,Bitcoin,37012.5,0.03,
+    {"timestamp": "2023-11-14T22:13:20Z", "crypto_name": "Ethereum", "price": 2050.1}
+
+``size`` and ``marketCap`` are optional. Sources are registered in
+``SOURCES`` by name (``file``, ``socket``, ``memory``); ``register_source``
+adds another, e.g. an exchange websocket client.
+"""
+import csv
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Type
+
+import numpy as np
+
+from src.utils.exception import CustomException
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Ticks = Dict[str, np.ndarray]
+TICK_COLUMNS = ["timestamp", "crypto_name", "price", "size", "marketCap"]
+# Accepted spellings of the columns in headers and JSON keys
+ALIASES = {"ts": "timestamp", "time": "timestamp", "symbol": "crypto_name", "asset": "crypto_name",
+           "qty": "size", "volume": "size", "market_cap": "marketCap"}
+
+
+def empty_ticks() -> Ticks:
+    return {"timestamp": np.zeros(0), "crypto_name": np.zeros(0, dtype=object), "price": np.zeros(0),
+            "size": np.zeros(0), "marketCap": np.zeros(0)}
+
+
+def _timestamp(value) -> float:
+    """Epoch seconds from a number or an ISO-8601 string."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        text = str(value).strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        stamp = datetime.fromisoformat(text)
+        if stamp.tzinfo is None:
+            # Naive times are UTC, like the daily bars
+            return (stamp - datetime(1970, 1, 1)).total_seconds()
+        return stamp.timestamp()
+
+
+def _number(value) -> float:
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_lines(lines: Sequence[str], header: Optional[List[str]] = None) -> Ticks:
+    """Turn tick lines (CSV in ``header`` order, or JSON objects) into a ``Ticks`` chunk; bad lines are skipped."""
+    columns = [ALIASES.get(c, c) for c in (header or TICK_COLUMNS)]
+    records = []
+    csv_lines = [line for line in lines if not line.lstrip().startswith("{")]
+    parsed_csv = iter(csv.reader(csv_lines))
+    for line in lines:
+        try:
+            if line.lstrip().startswith("{"):
+                record = {ALIASES.get(k, k): v for k, v in json.loads(line).items()}
+            else:
+                record = dict(zip(columns, next(parsed_csv)))
+            records.append((_timestamp(record["timestamp"]), str(record["crypto_name"]),
+                            _number(record.get("price")), _number(record.get("size", 0.0)),
+                            _number(record.get("marketCap"))))
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Skipping malformed tick {line[:80]!r}: {e}")
+    if not records:
+        return empty_ticks()
+    ts, names, price, size, mcap = zip(*records)
+    return {"timestamp": np.asarray(ts, dtype=np.float64), "crypto_name": np.asarray(names, dtype=object),
+            "price": np.asarray(price, dtype=np.float64), "size": np.nan_to_num(np.asarray(size, dtype=np.float64)),
+            "marketCap": np.asarray(mcap, dtype=np.float64)}
+
+
+def _header(line: str) -> Optional[List[str]]:
+    """Column names if ``line`` is a CSV header, else None."""
+    fields = [f.strip() for f in next(csv.reader([line]), [])]
+    names = [ALIASES.get(f, f) for f in fields]
+    return fields if "timestamp" in names and "crypto_name" in names else None
+
+
+class TickSource:
+    """Base class: ``read`` returns a chunk, an empty chunk on timeout, or None when exhausted."""
+
+    def read(self, max_ticks: int = 10_000, timeout: float = 0.1) -> Optional[Ticks]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileTailSource(TickSource):
+    """
+    Ticks appended to a file, like ``tail -f``. ``follow=False`` replays the
+    file and stops at its end. A partially written last line waits for its
+    newline.
+    """
+
+    def __init__(self, path, follow: bool = True, poll_interval: float = 0.05):
+        self.path = Path(path)
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self._file = None
+        self._partial = ""
+        self._header: Optional[List[str]] = None
+
+    def _open(self) -> bool:
+        if self._file is None:
+            if not self.path.exists():
+                if not self.follow:
+                    raise CustomException(f"Tick file not found: {self.path}")
+                return False
+            self._file = open(self.path, "r", newline="")
+        return True
+
+    def read(self, max_ticks: int = 10_000, timeout: float = 0.1) -> Optional[Ticks]:
+        deadline = time.monotonic() + timeout
+        lines: List[str] = []
+        while len(lines) < max_ticks:
+            line = self._file.readline() if self._open() else ""
+            if line.endswith("\n"):
+                line, self._partial = self._partial + line, ""
+                if self._header is None and _header(line) is not None:
+                    self._header = _header(line)
+                elif line.strip():
+                    lines.append(line)
+                continue
+            # End of the file for now; keep a partial line until its newline arrives
+            self._partial += line
+            if lines:
+                break
+            if not self.follow:
+                if self._partial.strip():
+                    lines.append(self._partial)
+                    self._partial = ""
+                    break
+                return None
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        return parse_lines(lines, self._header)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SocketSource(TickSource):
+    """
+    A local TCP listener standing in for an exchange feed: producers connect
+    and write tick lines (each connection may start with a CSV header).
+
+    Lines wait in a bounded buffer. When it is full the connection threads
+    stop reading, the kernel buffers fill up and TCP flow control slows the
+    producers down instead of losing ticks.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9009, max_buffered: int = 100_000):
+        self._lines: "queue.Queue[tuple]" = queue.Queue(maxsize=max_buffered)
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(0.5)
+        self.address = self._server.getsockname()
+        self._closed = threading.Event()
+        threading.Thread(target=self._accept, name="tick-socket", daemon=True).start()
+        logger.info(f"Listening for ticks on {self.address[0]}:{self.address[1]}")
+
+    def _accept(self):
+        while not self._closed.is_set():
+            try:
+                conn, peer = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._receive, args=(conn, peer), daemon=True).start()
+
+    def _receive(self, conn: socket.socket, peer):
+        header = None
+        with conn, conn.makefile("r", newline="") as stream:
+            for line in stream:
+                if self._closed.is_set():
+                    return
+                if header is None and _header(line) is not None:
+                    header = _header(line)
+                elif line.strip():
+                    # Blocks while the buffer is full: backpressure on this producer
+                    self._lines.put((line, header))
+        logger.info(f"Tick producer {peer} disconnected")
+
+    def read(self, max_ticks: int = 10_000, timeout: float = 0.1) -> Optional[Ticks]:
+        if self._closed.is_set():
+            return None
+        items = []
+        try:
+            items.append(self._lines.get(timeout=timeout))
+            while len(items) < max_ticks:
+                items.append(self._lines.get_nowait())
+        except queue.Empty:
+            pass
+        if not items:
+            return empty_ticks()
+        chunks, start = [], 0
+        # Consecutive lines with the same header parse together
+        for i in range(1, len(items) + 1):
+            if i == len(items) or items[i][1] is not items[start][1]:
+                chunks.append(parse_lines([line for line, _ in items[start:i]], items[start][1]))
+                start = i
+        return chunks[0] if len(chunks) == 1 else concat_ticks(chunks)
+
+    def close(self):
+        self._closed.set()
+        self._server.close()
+
+
+class MemorySource(TickSource):
+    """Ticks from an iterable of chunks (tests, benchmarks, replays already in memory)."""
+
+    def __init__(self, chunks: Iterable[Mapping[str, Sequence]]):
+        self._chunks = iter(chunks)
+
+    def read(self, max_ticks: int = 10_000, timeout: float = 0.1) -> Optional[Ticks]:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return None
+        n = len(chunk["price"])
+        out = empty_ticks()
+        for col in TICK_COLUMNS:
+            if col in chunk:
+                out[col] = np.asarray(chunk[col], dtype=object if col == "crypto_name" else np.float64)
+            elif col == "size":
+                out[col] = np.zeros(n)
+            elif col == "marketCap":
+                out[col] = np.full(n, np.nan)
+        return out
+
+
+def concat_ticks(chunks: Sequence[Ticks]) -> Ticks:
+    return {col: np.concatenate([c[col] for c in chunks]) for col in TICK_COLUMNS}
+
+
+SOURCES: Dict[str, Type[TickSource]] = {
+    "file": FileTailSource,
+    "socket": SocketSource,
+    "memory": MemorySource,
+}
+
+
+def register_source(name: str, source_cls: Type[TickSource]):
+    """Add (or replace) a source type, e.g. register_source("ws", ExchangeWebsocketSource)."""
+    SOURCES[name] = source_cls
+
+
+def make_source(name: str, **kwargs) -> TickSource:
+    if name not in SOURCES:
+        raise CustomException(f"Unknown tick source: {name}", errors={"available": sorted(SOURCES)})
+    return SOURCES[name](**kwargs)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🔹 Running tick source test...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ticks.csv")
+        with open(path, "w") as f:
+            f.write("timestamp,crypto_name,price,size\n1700000000,Bitcoin,37000,0.5\n")
+            f.write('{"ts": "2023-11-14T22:13:21Z", "symbol": "Ethereum", "price": 2050.1}\n')
+            f.write("1700000002,Bitcoin,37001")  # no newline yet
+        source = FileTailSource(path, follow=True, poll_interval=0.01)
+        first = source.read(timeout=0.05)
+        assert list(first["crypto_name"]) == ["Bitcoin", "Ethereum"], first
+        with open(path, "a") as f:
+            f.write(",0.1\n")
+        second = source.read(timeout=0.05)
+        assert second["price"].tolist() == [37001.0] and second["size"].tolist() == [0.1], second
+        source.close()
+    print("✅ File tail: CSV + JSON lines, partial line completed on the next read")
+
+    server = SocketSource(port=0)
+    with socket.create_connection(server.address) as producer:
+        producer.sendall(b"time,asset,price\n1700000000,Solana,55.5\n1700000001,Solana,55.7\n")
+    ticks = empty_ticks()
+    for _ in range(20):
+        ticks = concat_ticks([ticks, server.read(timeout=0.05)])
+        if len(ticks["price"]) == 2:
+            break
+    server.close()
+    assert ticks["price"].tolist() == [55.5, 55.7], ticks
+    print("✅ Socket: ticks received with the producer's own header")
@@ -1,41 +1,59 @@
 # src/pipeline/training_pipeline.py
 
+import argparse
 from pathlib import Path
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
-from xgboost import XGBRegressor
+from typing import TYPE_CHECKING, Optional
 
-from src.components.data_ingestion import DataIngestion
-from src.components.data_transformation import DataTransformation
-from src.components.model_trainer import ModelTrainer
+from src.feature_spec import NON_FEATURE_COLS, TARGET_COL
+from src.utils.exception import CustomException
+from src.utils.metrics import enable_spans, save_spans, span
 
+if TYPE_CHECKING:
+    from src.components.candidates import CandidateSpec
+
+
+def run_training(data_path="data/crypto_prices.csv", artifacts_dir="artifacts",
+                 candidates: Optional["CandidateSpec"] = None, n_cores: Optional[int] = None,
+                 backtest_folds: Optional[int] = None, search_trials: Optional[int] = None,
+                 search_method: str = "halving"):
+    # Heavy imports (pandas, pyarrow, sklearn, xgboost via candidates) load here, so `--help` stays instant
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+
+    from src.components.candidates import normalize_candidates, select_best, train_candidates, uses_frame
+    from src.components.data_ingestion import DataIngestion
+    from src.components.feature_store import FeatureStore
+    from src.components.data_transformation import DataTransformation
+    from src.components.model_trainer import ModelTrainer
+    from src.components.model_compiler import compile_pipeline
+    from src.components.hyperparameter_search import run_search
+    from src.pipeline.backtest_pipeline import run_backtest
 
-def run_training(data_path="data/crypto_prices.csv", artifacts_dir="artifacts"):
     print("🔹 Training pipeline started...")
 
     artifacts_dir = Path(artifacts_dir)
 
     # 1) Prefer model-ready features if available
-    model_features_path = artifacts_dir / "crypto_features_model.csv"
-    if model_features_path.exists():
-        print(f"📂 Using pre-computed features: {model_features_path}")
-        df = pd.read_csv(model_features_path, parse_dates=["date"])
-    else:
-        # Fall back to ingestion + raw data
-        ingestion = DataIngestion(data_path=data_path, artifacts_dir=artifacts_dir)
-        df = ingestion.load_data()
-        ingestion.save_raw(df)
-        print("✅ Ingestion finished! Shape:", df.shape)
+    store = FeatureStore(artifacts_dir=artifacts_dir)
+    with span("ingestion"):
+        if store.exists():
+            print(f"📂 Using pre-computed features: {store.store_dir}")
+            df = store.read(model_ready=True)
+        else:
+            # Fall back to ingestion + raw data
+            ingestion = DataIngestion(data_path=data_path, artifacts_dir=artifacts_dir)
+            df = ingestion.load_data()
+            ingestion.save_raw(df)
+            print("✅ Ingestion finished! Shape:", df.shape)
 
     # 2) Define target
-    target_col = "vol_7d_target_next"
+    target_col = TARGET_COL
     if target_col not in df.columns:
         print(f"⚠️ Target '{target_col}' not found. Using 'close' as fallback.")
         target_col = "close"
 
-    X = df.drop(columns=[target_col, "date"], errors="ignore")
+    # Raw time columns are not model inputs (the store keeps them typed, not as strings)
+    X = df.drop(columns=list(dict.fromkeys([target_col, *NON_FEATURE_COLS])), errors="ignore")
     y = df[target_col]
 
     # 3) Split train/test
@@ -49,55 +67,122 @@ def run_training(data_path="data/crypto_prices.csv", artifacts_dir="artifacts"):
     categorical_cols = [c for c in X_train.columns if c not in numerical_cols]
 
     preprocessor = transformer.build_preprocessor(numerical_cols, categorical_cols)
-    preprocessor.fit(X_train)
-    transformer.save_preprocessor(preprocessor)
-    print("✅ Transformation finished! Numerical:", len(numerical_cols), "Categorical:", len(categorical_cols))
-
-    # 5) Define candidate models
-    rf_pipeline = Pipeline(steps=[
-        ("preprocessor", preprocessor),
-        ("model", RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1))
-    ])
-
-    xgb_pipeline = Pipeline(steps=[
-        ("preprocessor", preprocessor),
-        ("model", XGBRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42,
-            n_jobs=-1
-        ))
-    ])
-
-    # 6) Train both models
-    print("🔹 Training RandomForest...")
-    rf_pipeline.fit(X_train, y_train)
-    print("🔹 Training XGBoost...")
-    xgb_pipeline.fit(X_train, y_train)
-
-    # 7) Evaluate
+    # Fit and transform once; every candidate trains on the same cached matrices
+    with span("preprocessor_fit"):
+        Xt_train = preprocessor.fit_transform(X_train)
+        Xt_test = preprocessor.transform(X_test)
+    with span("save_preprocessor"):
+        transformer.save_preprocessor(preprocessor)
+    print("✅ Transformation finished! Numerical:", len(numerical_cols), "Categorical:", len(categorical_cols),
+          "| Matrix:", Xt_train.shape, "sparse" if preprocessor.sparse_output_ else "dense")
+
+    # 5a) Optionally tune each candidate first, on a validation split of the training rows only
+    specs = normalize_candidates(candidates)
+    searchable = {name: params for name, params in specs.items() if not uses_frame(name)}
+    if search_trials and searchable:
+        n_valid = max(1, Xt_train.shape[0] // 5)
+        with span("search"):
+            search = run_search(Xt_train[:-n_valid], y_train.iloc[:-n_valid], Xt_train[-n_valid:],
+                                y_train.iloc[-n_valid:], candidates=searchable, n_trials=search_trials,
+                                method=search_method, n_cores=n_cores, artifacts_dir=artifacts_dir)
+        print("Search leaderboard (top 10):\n" + search["leaderboard"].head(10).to_string())
+        # Train (and backtest) the winners' settings below; baselines keep theirs
+        candidates = {name: search["best"].get(name, params) for name, params in specs.items()}
+
+    # 5) Train every candidate concurrently on the transformed matrices (no preprocessor refit)
+    print("🔹 Training candidates...")
+    with span("train_candidates"):
+        results = train_candidates(Xt_train, y_train, Xt_test, y_test, candidates=candidates,
+                                   n_cores=n_cores, artifacts_dir=artifacts_dir, frames=(X_train, X_test))
+
+    # 6) Evaluate
     trainer = ModelTrainer(artifacts_dir=artifacts_dir)
-    rf_metrics = trainer.evaluate(y_test, rf_pipeline.predict(X_test))
-    xgb_metrics = trainer.evaluate(y_test, xgb_pipeline.predict(X_test))
-
-    print("RandomForest metrics:", rf_metrics)
-    print("XGBoost metrics:", xgb_metrics)
-
-    # 8) Save best model
-    if xgb_metrics["r2"] >= rf_metrics["r2"]:
-        best_pipeline = xgb_pipeline
-        print("✅ XGBoost selected as best model")
+    for name, result in results.items():
+        print(f"{name} metrics:", result["metrics"], f"({result['seconds']:.1f}s)")
+
+    # 7) Save best model as one self-contained pipeline around the already fitted preprocessor
+    if backtest_folds:
+        # Pick the winner by mean R² over walk-forward folds instead of the single split
+        with span("backtest"):
+            summary = run_backtest(df, candidates=candidates, n_folds=backtest_folds, n_cores=n_cores,
+                                   artifacts_dir=artifacts_dir)["summary"]
+        print("Walk-forward backtest:\n" + summary.to_string())
+        best_name = summary.index[0]
     else:
-        best_pipeline = rf_pipeline
-        print("✅ RandomForest selected as best model")
-
-    trainer.save_model(best_pipeline, filename="best_pipeline.joblib")
+        best_name = select_best(results, metric="r2")
+    best_model = results[best_name]["model"]
+    print(f"✅ {best_name} selected as best model")
+    if uses_frame(best_name):
+        # Baselines read the raw feature columns themselves
+        best_pipeline = Pipeline(steps=[("model", best_model)])
+        best_test_pred = best_model.predict(X_test)
+    else:
+        best_pipeline = Pipeline(steps=[("preprocessor", preprocessor), ("model", best_model)])
+        best_test_pred = best_model.predict(Xt_test)
+
+    # 7b) Per-crypto and per-month errors of the winner, with bootstrap intervals
+    with span("evaluation_report"):
+        report = trainer.evaluate_report(
+            y_test, best_test_pred,
+            groups=X_test["crypto_name"] if "crypto_name" in X_test.columns else None,
+            dates=df["date"].loc[X_test.index] if "date" in df.columns else None)
+        report_dir = trainer.save_report(report)
+    overall = report["overall"].iloc[0]
+    print("Test metrics with 95% CI: " + ", ".join(
+        f"{m} {overall[m]:.4f} [{overall[m + '_lo']:.4f}, {overall[m + '_hi']:.4f}]" for m in ("rmse", "mae", "r2"))
+        + f" | breakdowns in {report_dir}")
+
+    # 8) Export the NumPy-only version for low-latency scoring, memory-mapped by the servers
+    try:
+        with span("compile_model"):
+            compiled = compile_pipeline(best_pipeline)
+    except CustomException as ce:
+        compiled = None
+        print(f"⚠️ Compiled export skipped: {ce}")
+
+    # 9) Publish as a new content-hashed version in the model registry and make it current
+    data_range = {"rows": len(df)}
+    if "date" in df.columns:
+        data_range.update(start=str(df["date"].min()), end=str(df["date"].max()))
+    if "crypto_name" in df.columns:
+        data_range["cryptos"] = int(df["crypto_name"].nunique())
+    with span("save_model"):
+        version = trainer.publish_model(best_pipeline, metrics=results[best_name]["metrics"],
+                                        feature_columns=list(X.columns), data_range=data_range,
+                                        compiled=compiled, target=target_col, candidate=best_name,
+                                        test_ci={k: float(v) for k, v in overall.drop("scope").items()},
+                                        known_cryptos=sorted(X_train["crypto_name"].astype(str).unique())
+                                        if "crypto_name" in X_train.columns else [])
+    print(f"✅ Published model version {version}")
 
     print("✅ Training pipeline finished.")
 
 
 if __name__ == "__main__":
-    run_training()
+    parser = argparse.ArgumentParser(description="Train candidate models and save the best pipeline.")
+    parser.add_argument("--candidates", default=None,
+                        help="Comma-separated candidate names (see src/components/candidates.py)")
+    parser.add_argument("--baselines", action="store_true",
+                        help="Also train the EWMA, GARCH(1,1) and HAR-RV volatility baselines")
+    parser.add_argument("--cores", type=int, default=None, help="Cores to split between candidates")
+    parser.add_argument("--backtest-folds", type=int, default=None,
+                        help="Select the best model by a walk-forward backtest with this many folds")
+    parser.add_argument("--search-trials", type=int, default=None,
+                        help="Tune each candidate over this many sampled configurations first")
+    parser.add_argument("--search-method", default="halving", choices=["halving", "random"])
+    parser.add_argument("--profile", action="store_true",
+                        help="Record stage spans (wall/CPU time, peak RSS) to artifacts/spans/training.json")
+    args = parser.parse_args()
+    if args.profile:
+        enable_spans()
+    from src.components.candidates import BASELINE_CANDIDATES, DEFAULT_CANDIDATES
+
+    names = args.candidates.split(",") if args.candidates else None
+    if args.baselines:
+        names = list(dict.fromkeys((names or DEFAULT_CANDIDATES) + BASELINE_CANDIDATES))
+    with span("training"):
+        run_training(candidates=names, n_cores=args.cores,
+                     backtest_folds=args.backtest_folds, search_trials=args.search_trials,
+                     search_method=args.search_method)
+    if args.profile:
+        save_spans("artifacts/spans/training.json")
@@ -0,0 +1,283 @@
+"""
+Stage spans and Prometheus metrics.
+
+``span(name)`` (context manager) and ``@timed(name)`` (decorator) record wall
+time, CPU time and peak RSS of a pipeline stage. Spans are off unless
+``enable_spans()`` is called or ``CRYPTO_SPANS=1`` is set; when off, ``span()``
+returns one shared no-op context, so instrumented code pays a function call.
+
+``Counter``/``Gauge``/``Histogram`` are minimal thread-safe metrics kept in
+``REGISTRY``; ``render()`` writes them in the Prometheus text format for the
+Flask ``/metrics`` endpoint.
+"""
+
+import bisect
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logger import get_logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = get_logger(__name__)
+
+SPANS_ENV = "CRYPTO_SPANS"
+_enabled = os.environ.get(SPANS_ENV, "") not in ("", "0")
+_records: List[dict] = []
+_records_lock = threading.Lock()
+_local = threading.local()
+_NOOP = contextlib.nullcontext()
+
+
+def enable_spans(enabled: bool = True):
+    """Turn span recording on or off (also for child processes started afterwards)."""
+    global _enabled
+    _enabled = enabled
+    os.environ[SPANS_ENV] = "1" if enabled else "0"
+
+
+def spans_enabled() -> bool:
+    return _enabled
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "wall", "cpu")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self.name)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        path = "/".join(_local.stack)
+        _local.stack.pop()
+        record = {"span": path, "wall_s": wall, "cpu_s": cpu, "peak_rss_mb": peak_rss_mb(),
+                  "pid": os.getpid(), "ok": exc_type is None, **self.labels}
+        with _records_lock:
+            _records.append(record)
+        STAGE_SECONDS.observe(wall, stage=self.name)
+        logger.info(f"[span] {path}: {wall:.3f}s wall, {cpu:.3f}s cpu, peak RSS {record['peak_rss_mb'] or 0:.0f} MB")
+        return False
+
+
+def span(name: str, **labels):
+    """Context manager timing one stage; nested spans are recorded as ``outer/inner``."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, labels)
+
+
+def timed(name: Optional[str] = None):
+    """Decorator form of ``span``; defaults to the function's qualified name."""
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(label, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def span_records() -> List[dict]:
+    with _records_lock:
+        return list(_records)
+
+
+def save_spans(path) -> Path:
+    """Write the spans recorded so far as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = span_records()
+    path.write_text(json.dumps(records, indent=2))
+    logger.info(f"Saved {len(records)} spans to {path}")
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Prometheus metrics
+# ---------------------------------------------------------------------------
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v:g}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def clear(self):
+        """Drop every label set (e.g. before publishing a new model version)."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v:g}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Optional["MetricsRegistry"] = None):
+        super().__init__(name, help_text, registry)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Wall time of instrumented pipeline stages (spans enabled only).")
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+if __name__ == "__main__":
+    print("🔹 Running metrics test...")
+    enable_spans()
+    with span("outer"):
+        with span("inner", rows=10):
+            sum(range(100_000))
+    print(span_records())
+    requests = Counter("demo_requests_total", "Demo counter.")
+    requests.inc(endpoint="/predict")
+    print(render())
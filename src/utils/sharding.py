@@ -0,0 +1,92 @@
+"""
+Process sharding helpers.
+
+Per-asset work is split into shards of roughly equal row counts, and the
+arrays the workers read and write live in ``multiprocessing.shared_memory``
+blocks, so nothing but block names and segment bounds is pickled between
+processes.
+"""
+
+import heapq
+import os
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects CPU affinity / container limits where exposed)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def balance_shards(lengths, n_shards: int) -> List[np.ndarray]:
+    """
+    Assign segments to ``n_shards`` shards with near-equal total length.
+
+    Greedy longest-first: each segment goes to the currently lightest shard.
+    Returns the segment indices of every non-empty shard, in ascending order.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_shards = max(1, min(n_shards, len(lengths)))
+    heap = [(0, k) for k in range(n_shards)]
+    members: List[List[int]] = [[] for _ in range(n_shards)]
+    for seg in np.argsort(-lengths, kind="stable"):
+        load, k = heapq.heappop(heap)
+        members[k].append(int(seg))
+        heapq.heappush(heap, (load + int(lengths[seg]), k))
+    return [np.sort(np.array(m, dtype=np.int64)) for m in members if m]
+
+
+def segment_rows(offsets: np.ndarray, segments: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row positions of the given segments and their offsets once gathered.
+
+    ``values[rows]`` lays the segments out contiguously; ``local_offsets``
+    describes them the same way ``offsets`` describes the full table.
+    """
+    starts, ends = offsets[segments], offsets[segments + 1]
+    lengths = ends - starts
+    local_offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    rows = np.repeat(starts - local_offsets[:-1], lengths) + np.arange(local_offsets[-1])
+    return rows, local_offsets
+
+
+class SharedArray:
+    """
+    NumPy array backed by a named shared-memory block.
+
+    The creating process owns the block and unlinks it on ``close()``;
+    workers ``attach()`` by name and only detach.
+    """
+
+    def __init__(self, shape, dtype=np.float64, name: str = None):
+        self.shape, self.dtype = tuple(shape), np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def attach(cls, name: str, shape, dtype=np.float64) -> "SharedArray":
+        return cls(shape, dtype=dtype, name=name)
+
+    @property
+    def spec(self) -> Tuple[str, tuple, str]:
+        """(name, shape, dtype) to hand to a worker."""
+        return self.shm.name, self.shape, self.dtype.str
+
+    def close(self):
+        # Views into the buffer must go before the block can be closed
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedArray":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
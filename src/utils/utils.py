@@ -5,7 +5,6 @@
 from pathlib import Path
 import joblib
 import numpy as np
-from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
 from typing import Dict
 
 
@@ -26,6 +25,9 @@ def load_pickle(path: str):
 
 def evaluate(y_true, y_pred) -> Dict[str, float]:
     """Evaluate predictions with RMSE, MAE, and R²."""
+    # Imported here so importing the helpers does not pull in sklearn
+    from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
+
     mse = mean_squared_error(y_true, y_pred)
     rmse = np.sqrt(mse)
     mae = mean_absolute_error(y_true, y_pred)